@@ -12,7 +12,19 @@ from app.store.database.gino import db
 # access to the values within the .ini file in use.
 from app.web.config import Config, DatabaseConfig
 from app.admin.models import AdminModel
-from app.quiz.models import ThemeModel, QuestionModel, AnswerModel
+from app.leaderboard.models import ScoreModel
+from app.bot.models import (
+    LongPollCheckpointModel,
+    UpdateLogModel,
+    GameSessionModel,
+    SeenUpdateModel,
+)
+from app.quiz.models import (
+    ThemeModel,
+    QuestionModel,
+    AnswerModel,
+    QuizVersionModel,
+)
 
 with open(os.environ['CONFIGPATH']) as fh:
     cfg = yaml.safe_load(fh)
@@ -0,0 +1,28 @@
+"""long poll checkpoints
+
+Revision ID: 02f29a07c5f1
+Revises: 86f3a2a44206
+Create Date: 2026-10-18 08:49:12.433260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '02f29a07c5f1'
+down_revision = '86f3a2a44206'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('long_poll_checkpoints',
+    sa.Column('group_id', sa.BigInteger(), nullable=False),
+    sa.Column('ts', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('group_id')
+    )
+
+
+def downgrade():
+    op.drop_table('long_poll_checkpoints')
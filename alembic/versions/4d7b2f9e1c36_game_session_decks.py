@@ -0,0 +1,40 @@
+"""game session decks
+
+Revision ID: 4d7b2f9e1c36
+Revises: e8f20b6c4a11
+Create Date: 2026-10-18 12:26:40.318527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d7b2f9e1c36'
+down_revision = 'e8f20b6c4a11'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a shuffled id list can't be turned into a deck, running games end
+    op.execute("UPDATE game_sessions SET status = 'finished', finished_at = now() WHERE status = 'active'")
+    op.drop_column('game_sessions', 'deck')
+    op.add_column('game_sessions', sa.Column('theme_id', sa.BigInteger(), nullable=True))
+    op.add_column('game_sessions', sa.Column('deck_size', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('game_sessions', sa.Column('deck_step', sa.BigInteger(), server_default='1', nullable=False))
+    op.add_column('game_sessions', sa.Column('deck_offset', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('game_sessions', sa.Column('rounds', sa.Integer(), server_default='0', nullable=False))
+    for column in ('deck_size', 'deck_step', 'deck_offset', 'rounds'):
+        op.alter_column('game_sessions', column, server_default=None)
+
+
+def downgrade():
+    op.execute("UPDATE game_sessions SET status = 'finished', finished_at = now() WHERE status = 'active'")
+    op.drop_column('game_sessions', 'rounds')
+    op.drop_column('game_sessions', 'deck_offset')
+    op.drop_column('game_sessions', 'deck_step')
+    op.drop_column('game_sessions', 'deck_size')
+    op.drop_column('game_sessions', 'theme_id')
+    op.add_column('game_sessions', sa.Column('deck', sa.JSON(), server_default='[]', nullable=False))
+    op.alter_column('game_sessions', 'deck', server_default=None)
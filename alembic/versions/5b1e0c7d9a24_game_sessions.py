@@ -0,0 +1,37 @@
+"""game sessions
+
+Revision ID: 5b1e0c7d9a24
+Revises: 907c9ce81bf8
+Create Date: 2026-10-18 10:12:05.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0c7d9a24'
+down_revision = '907c9ce81bf8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('game_sessions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('peer_id', sa.BigInteger(), nullable=False),
+    sa.Column('group_id', sa.BigInteger(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('deck', sa.JSON(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('scores', sa.JSON(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('game_sessions_status_idx', 'game_sessions', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('game_sessions_status_idx', table_name='game_sessions')
+    op.drop_table('game_sessions')
@@ -0,0 +1,32 @@
+"""update log
+
+Revision ID: 907c9ce81bf8
+Revises: 02f29a07c5f1
+Create Date: 2026-10-18 08:52:41.358213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '907c9ce81bf8'
+down_revision = '02f29a07c5f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('update_log',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('partition', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('update_log_partition_id_idx', 'update_log', ['partition', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('update_log_partition_id_idx', table_name='update_log')
+    op.drop_table('update_log')
@@ -0,0 +1,26 @@
+"""quiz foreign key indexes
+
+Revision ID: a61c5d8e3f07
+Revises: 4d7b2f9e1c36
+Create Date: 2026-10-18 12:58:13.904416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61c5d8e3f07'
+down_revision = '4d7b2f9e1c36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('questions_theme_id_idx', 'questions', ['theme_id'], unique=False)
+    op.create_index('answers_question_id_idx', 'answers', ['question_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('answers_question_id_idx', table_name='answers')
+    op.drop_index('questions_theme_id_idx', table_name='questions')
@@ -0,0 +1,32 @@
+"""seen updates
+
+Revision ID: b5e7c2a9d013
+Revises: a61c5d8e3f07
+Create Date: 2026-10-18 14:21:37.412803
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e7c2a9d013'
+down_revision = 'a61c5d8e3f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('seen_updates',
+    sa.Column('group_id', sa.BigInteger(), nullable=False),
+    sa.Column('peer_id', sa.BigInteger(), nullable=False),
+    sa.Column('conversation_message_id', sa.BigInteger(), nullable=False),
+    sa.Column('seen_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('group_id', 'peer_id', 'conversation_message_id')
+    )
+    op.create_index('seen_updates_seen_at_idx', 'seen_updates', ['seen_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('seen_updates_seen_at_idx', table_name='seen_updates')
+    op.drop_table('seen_updates')
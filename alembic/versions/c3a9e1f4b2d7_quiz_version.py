@@ -0,0 +1,28 @@
+"""quiz version
+
+Revision ID: c3a9e1f4b2d7
+Revises: 5b1e0c7d9a24
+Create Date: 2026-10-18 10:58:17.204516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e1f4b2d7'
+down_revision = '5b1e0c7d9a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('quiz_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('quiz_version')
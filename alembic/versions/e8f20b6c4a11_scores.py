@@ -0,0 +1,29 @@
+"""scores
+
+Revision ID: e8f20b6c4a11
+Revises: c3a9e1f4b2d7
+Create Date: 2026-10-18 11:41:52.618093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f20b6c4a11'
+down_revision = 'c3a9e1f4b2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scores',
+    sa.Column('peer_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('score', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('peer_id', 'user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('scores')
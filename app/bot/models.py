@@ -0,0 +1,51 @@
+from app.store.database.gino import db
+
+
+class LongPollCheckpointModel(db.Model):
+    __tablename__ = "long_poll_checkpoints"
+
+    group_id = db.Column(db.BigInteger(), primary_key=True)
+    ts = db.Column(db.BigInteger(), nullable=False)
+
+
+class UpdateLogModel(db.Model):
+    __tablename__ = "update_log"
+
+    id = db.Column(db.BigInteger(), primary_key=True)
+    partition = db.Column(db.Integer(), nullable=False)
+    payload = db.Column(db.JSON(), nullable=False)
+    claimed_at = db.Column(db.DateTime())
+
+    _idx = db.Index("update_log_partition_id_idx", "partition", "id")
+
+
+class GameSessionModel(db.Model):
+    __tablename__ = "game_sessions"
+
+    id = db.Column(db.BigInteger(), primary_key=True)
+    peer_id = db.Column(db.BigInteger(), nullable=False)
+    group_id = db.Column(db.BigInteger())
+    status = db.Column(db.String(16), nullable=False)
+    theme_id = db.Column(db.BigInteger())
+    # the Deck questions are picked from, and the index of the one asked
+    deck_size = db.Column(db.Integer(), nullable=False)
+    deck_step = db.Column(db.BigInteger(), nullable=False)
+    deck_offset = db.Column(db.BigInteger(), nullable=False)
+    rounds = db.Column(db.Integer(), nullable=False)
+    position = db.Column(db.Integer(), nullable=False, default=0)
+    scores = db.Column(db.JSON(), nullable=False, default={})
+    started_at = db.Column(db.DateTime(), nullable=False, server_default=db.func.now())
+    finished_at = db.Column(db.DateTime())
+
+    _idx = db.Index("game_sessions_status_idx", "status")
+
+
+class SeenUpdateModel(db.Model):
+    __tablename__ = "seen_updates"
+
+    group_id = db.Column(db.BigInteger(), primary_key=True)
+    peer_id = db.Column(db.BigInteger(), primary_key=True)
+    conversation_message_id = db.Column(db.BigInteger(), primary_key=True)
+    seen_at = db.Column(db.DateTime(), nullable=False, server_default=db.func.now())
+
+    _idx = db.Index("seen_updates_seen_at_idx", "seen_at")
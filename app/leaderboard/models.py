@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+
+from app.store.database.gino import db
+
+
+@dataclass
+class Score:
+    place: int
+    user_id: int
+    score: int
+
+
+class ScoreModel(db.Model):
+    __tablename__ = "scores"
+
+    # the global leaderboard is the sum over chats, so it is not stored
+    peer_id = db.Column(db.BigInteger(), primary_key=True)
+    user_id = db.Column(db.BigInteger(), primary_key=True)
+    score = db.Column(db.BigInteger(), nullable=False)
@@ -0,0 +1,10 @@
+import typing
+
+from app.leaderboard.views import LeaderboardView
+
+if typing.TYPE_CHECKING:
+    from app.web.app import Application
+
+
+def setup_routes(app: "Application"):
+    app.router.add_view("/leaderboard.list", LeaderboardView)
@@ -0,0 +1,20 @@
+from marshmallow import Schema, fields, validate
+
+
+class LeaderboardRequestSchema(Schema):
+    # the global leaderboard if not set
+    peer_id = fields.Int()
+    offset = fields.Int(missing=0, validate=validate.Range(min=0))
+    limit = fields.Int(missing=10, validate=validate.Range(min=1, max=100))
+
+
+class ScoreSchema(Schema):
+    place = fields.Int()
+    user_id = fields.Int()
+    score = fields.Int()
+
+
+class LeaderboardSchema(Schema):
+    peer_id = fields.Int(allow_none=True)
+    total = fields.Int()
+    scores = fields.Nested(ScoreSchema, many=True)
@@ -0,0 +1,21 @@
+from aiohttp_apispec import querystring_schema, response_schema
+
+from app.leaderboard.schemes import LeaderboardRequestSchema, LeaderboardSchema
+from app.web.app import View
+from app.web.mixins import AuthRequiredMixin
+from app.web.utils import json_response
+
+
+class LeaderboardView(AuthRequiredMixin, View):
+    @querystring_schema(LeaderboardRequestSchema)
+    @response_schema(LeaderboardSchema)
+    async def get(self):
+        peer_id = self.query.get("peer_id")
+        total, scores = await self.store.leaderboard.page(
+            peer_id, self.query["offset"], self.query["limit"]
+        )
+        return json_response(
+            data=LeaderboardSchema().dump(
+                {"peer_id": peer_id, "total": total, "scores": scores}
+            )
+        )
@@ -38,6 +38,8 @@ class AnswerModel(db.Model):
         db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False
     )
 
+    _idx = db.Index("answers_question_id_idx", "question_id")
+
     def to_dc(self):
         return Answer(title=self.title, is_correct=self.is_correct)
 
@@ -59,6 +61,8 @@ class QuestionModel(db.Model):
         db.ForeignKey('themes.id', ondelete='CASCADE'), nullable=False
     )
 
+    _idx = db.Index("questions_theme_id_idx", "theme_id")
+
     def __init__(self, **kw):
         super().__init__(**kw)
         self._answers: List[AnswerModel] = list()
@@ -78,3 +82,13 @@ class QuestionModel(db.Model):
     @add_answer.setter
     def add_answer(self, val: AnswerModel):
         self._answers.append(val)
+
+
+class QuizVersionModel(db.Model):
+    """Versions shared by every process: the question bank row is bumped by
+    every admin write to questions, the themes row by new themes."""
+
+    __tablename__ = "quiz_version"
+
+    id = db.Column(db.Integer(), primary_key=True)
+    version = db.Column(db.BigInteger(), nullable=False)
@@ -1,4 +1,11 @@
-from marshmallow import Schema, fields
+from marshmallow import (
+    EXCLUDE,
+    Schema,
+    ValidationError,
+    fields,
+    validate,
+    validates_schema,
+)
 
 
 class ThemeSchema(Schema):
@@ -18,6 +25,13 @@ class AnswerSchema(Schema):
     is_correct = fields.Bool(required=True)
 
 
+class ThemeListRequestSchema(Schema):
+    # keyset pagination: the next page starts after the last id returned,
+    # every theme after after_id without a limit
+    after_id = fields.Int()
+    limit = fields.Int(validate=validate.Range(min=1, max=1000))
+
+
 class ThemeListSchema(Schema):
     themes = fields.Nested(ThemeSchema, many=True)
 
@@ -26,5 +40,63 @@ class ThemeIdSchema(Schema):
     theme_id = fields.Int()
 
 
+class ListQuestionRequestSchema(ThemeIdSchema):
+    # keyset pagination: the next page starts after the last id returned,
+    # every question after after_id without a limit
+    after_id = fields.Int()
+    limit = fields.Int(validate=validate.Range(min=1, max=1000))
+    # every question after after_id as NDJSON, limit is ignored
+    stream = fields.Bool(missing=False)
+
+
 class ListQuestionSchema(Schema):
     questions = fields.Nested(QuestionSchema, many=True)
+
+
+class ImportQuestionSchema(Schema):
+    """A row of /quiz.import_questions, the theme is given by id or title."""
+
+    class Meta:
+        # ids of exported questions are ignored, they are new on import
+        unknown = EXCLUDE
+
+    title = fields.Str(required=True, validate=validate.Length(min=1, max=50))
+    theme_id = fields.Int()
+    theme = fields.Str()
+    answers = fields.Nested(
+        AnswerSchema, many=True, required=True, validate=validate.Length(min=2)
+    )
+
+    @validates_schema
+    def validate_question(self, data, **kwargs):
+        if ("theme_id" in data) == ("theme" in data):
+            raise ValidationError("Either theme_id or theme is required.", "theme")
+        answers = data.get("answers", [])
+        if sum(answer["is_correct"] for answer in answers) != 1:
+            raise ValidationError("Exactly one answer must be correct.", "answers")
+        if any(not 1 <= len(answer["title"]) <= 50 for answer in answers):
+            raise ValidationError("Answers are 1 to 50 characters long.", "answers")
+
+
+class ImportThemeSchema(Schema):
+    """A row of type theme, as /quiz.export writes them."""
+
+    class Meta:
+        unknown = EXCLUDE
+
+    # the id in the exporting database, questions of the upload refer to it
+    id = fields.Int()
+    title = fields.Str(required=True, validate=validate.Length(min=1, max=50))
+
+
+class RowErrorSchema(Schema):
+    row = fields.Int()
+    errors = fields.Dict()
+
+
+class ImportReportSchema(Schema):
+    themes = fields.Int()
+    imported = fields.Int()
+    failed = fields.Int()
+    # the first errors only, failed counts them all
+    errors = fields.Nested(RowErrorSchema, many=True)
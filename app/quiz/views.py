@@ -1,17 +1,24 @@
 from aiohttp.web_exceptions import HTTPConflict, HTTPNotFound, HTTPBadRequest
+from aiohttp.web_response import Response, StreamResponse
 from aiohttp_apispec import request_schema, response_schema, querystring_schema
+from asyncpg import ForeignKeyViolationError, UniqueViolationError
 
 from app.quiz.models import Answer
 from app.quiz.schemes import (
     ThemeSchema,
     ThemeListSchema,
+    ThemeListRequestSchema,
     QuestionSchema,
-    ThemeIdSchema,
+    ListQuestionRequestSchema,
     ListQuestionSchema,
+    ImportReportSchema,
 )
+from app.store.quiz.cache import etag
+from app.store.quiz.exporter import export_rows, gzip_ndjson
+from app.store.quiz.importer import QuestionImporter, csv_rows, ndjson_rows
 from app.web.app import View
 from app.web.mixins import AuthRequiredMixin
-from app.web.utils import json_response
+from app.web.utils import json_response, ndjson_response
 
 
 class ThemeAddView(AuthRequiredMixin, View):
@@ -27,10 +34,20 @@ class ThemeAddView(AuthRequiredMixin, View):
 
 
 class ThemeListView(AuthRequiredMixin, View):
+    @querystring_schema(ThemeListRequestSchema)
     @response_schema(ThemeListSchema)
     async def get(self):
-        themes = await self.store.quizzes.list_themes()
-        return json_response(data=ThemeListSchema().dump({"themes": themes}))
+        themes = await self.store.quizzes.list_themes(
+            after_id=self.query.get("after_id"), limit=self.query.get("limit")
+        )
+        tag = etag(themes)
+        matches = self.request.if_none_match or ()
+        if any(match.value in (tag, "*") for match in matches):
+            response = Response(status=304)
+        else:
+            response = json_response(data=ThemeListSchema().dump({"themes": themes}))
+        response.etag = tag
+        return response
 
 
 class QuestionAddView(AuthRequiredMixin, View):
@@ -38,14 +55,7 @@ class QuestionAddView(AuthRequiredMixin, View):
     @response_schema(QuestionSchema)
     async def post(self):
         title = self.data["title"]
-        existing_question = await self.store.quizzes.get_question_by_title(title)
-        if existing_question:
-            raise HTTPConflict
-
         theme_id = self.data["theme_id"]
-        theme = await self.store.quizzes.get_theme_by_id(id_=theme_id)
-        if not theme:
-            raise HTTPNotFound
 
         if len(self.data["answers"]) < 2:
             raise HTTPBadRequest
@@ -62,20 +72,30 @@ class QuestionAddView(AuthRequiredMixin, View):
         if not any(correct):
             raise HTTPBadRequest
 
-        question = await self.store.quizzes.create_question(
-            title=title,
-            theme_id=theme_id,
-            answers=parsed_answers,
-        )
+        # the constraints are the checks, so there is no check-then-act race
+        try:
+            question = await self.store.quizzes.create_question(
+                title=title,
+                theme_id=theme_id,
+                answers=parsed_answers,
+            )
+        except UniqueViolationError:
+            raise HTTPConflict
+        except ForeignKeyViolationError:
+            raise HTTPNotFound
         return json_response(data=QuestionSchema().dump(question))
 
 
 class QuestionListView(AuthRequiredMixin, View):
-    @querystring_schema(ThemeIdSchema)
+    @querystring_schema(ListQuestionRequestSchema)
     @response_schema(ListQuestionSchema)
     async def get(self):
+        if self.query["stream"]:
+            return await self.stream()
         questions = await self.store.quizzes.list_questions(
-            theme_id=self.data.get("theme_id")
+            theme_id=self.query.get("theme_id"),
+            after_id=self.query.get("after_id"),
+            limit=self.query.get("limit"),
         )
         return json_response(
             data=ListQuestionSchema().dump(
@@ -84,3 +104,53 @@ class QuestionListView(AuthRequiredMixin, View):
                 }
             )
         )
+
+    async def stream(self):
+        questions = self.store.quizzes.iter_questions(
+            theme_id=self.query.get("theme_id"), after_id=self.query.get("after_id")
+        )
+        schema = QuestionSchema()
+        return await ndjson_response(
+            self.request, (schema.dump(question) async for question in questions)
+        )
+
+
+class QuestionImportView(AuthRequiredMixin, View):
+    @response_schema(ImportReportSchema)
+    async def post(self):
+        """Imports an NDJSON or, with Content-Type text/csv, a CSV upload.
+
+        The body is read line by line while it is uploaded, so it is not
+        limited by client_max_size, but a line is by the stream buffer. An
+        archive of /quiz.export is sent as is with Content-Encoding: gzip.
+        """
+        lines = self.request.content
+        if self.request.content_type == "text/csv":
+            rows = csv_rows(lines)
+        else:
+            rows = ndjson_rows(lines)
+        try:
+            report = await QuestionImporter(self.store.quizzes).run(rows)
+        except ValueError as e:
+            # a line over the stream buffer, nothing was imported
+            raise HTTPBadRequest(reason=str(e))
+        except UniqueViolationError:
+            # written by another request during the import
+            raise HTTPConflict
+        return json_response(data=ImportReportSchema().dump(report))
+
+
+class QuizExportView(AuthRequiredMixin, View):
+    async def get(self):
+        """The whole quiz as gzip-compressed NDJSON, see export_rows."""
+        response = StreamResponse(
+            headers={
+                "Content-Type": "application/gzip",
+                "Content-Disposition": 'attachment; filename="quiz.ndjson.gz"',
+            }
+        )
+        await response.prepare(self.request)
+        async for data in gzip_ndjson(export_rows(self.store.quizzes)):
+            await response.write(data)
+        await response.write_eof()
+        return response
@@ -10,17 +10,24 @@ class Store:
     def __init__(self, app: "Application"):
         from app.store.bot.manager import BotManager
         from app.store.admin.accessor import AdminAccessor
+        from app.store.leaderboard.accessor import LeaderboardAccessor
         from app.store.quiz.accessor import QuizAccessor
+        from app.store.timers.accessor import TimerAccessor
         from app.store.vk_api.accessor import VkApiAccessor
 
         self.quizzes = QuizAccessor(app)
         self.admins = AdminAccessor(app)
-        self.vk_api = VkApiAccessor(app)
+        self.timers = TimerAccessor(app)
+        self.leaderboard = LeaderboardAccessor(app)
+        # games are restored before the long poll delivers the first answer
         self.bots_manager = BotManager(app)
+        self.vk_api = VkApiAccessor(app)
 
 
 def setup_store(app: "Application"):
     app.database = Database(app)
-    app.store = Store(app)
+    # the database is bound before the accessors start and closed after
+    # they are done, so they can read and write it in connect/disconnect
     app.on_startup.append(app.database.connect)
+    app.store = Store(app)
     app.on_cleanup.append(app.database.disconnect)
@@ -0,0 +1,276 @@
+import typing
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.bot.models import GameSessionModel
+from app.store.bot.worklog import partition_of
+from app.store.database.buffer import Channel
+from app.store.quiz.bank import QuestionBank
+from app.store.quiz.matcher import AnswerMatcher
+from app.store.quiz.selector import Deck, QuestionSelector
+
+if typing.TYPE_CHECKING:
+    from app.web.app import Application
+
+ACTIVE = "active"
+FINISHED = "finished"
+
+ALREADY_STARTED = "Игра уже идёт, отвечайте на вопрос!"
+NO_QUESTIONS = "Вопросов пока нет, загляните позже."
+NOT_STARTED = "Игра не запущена. Напишите /start, чтобы начать."
+RIGHT = "Верно!"
+TIME_IS_UP = "Время вышло! Правильный ответ:"
+WRONG = "Неверно, попробуйте ещё раз."
+
+# transitions of a session coalesce in the buffer, only the last is written
+GAME_SESSIONS = Channel(
+    table=GameSessionModel.__table__,
+    key=("id",),
+    update=lambda query: {
+        "position": query.excluded.position,
+        "scores": query.excluded.scores,
+        "status": query.excluded.status,
+        "finished_at": query.excluded.finished_at,
+    },
+)
+
+
+@dataclass
+class GameSession:
+    __slots__ = (
+        "id",
+        "peer_id",
+        "group_id",
+        "theme_id",
+        "deck",
+        "rounds",
+        "position",
+        "question_id",
+        "scores",
+        "matcher",
+    )
+
+    id: int
+    peer_id: int
+    group_id: Optional[int]
+    theme_id: Optional[int]
+    deck: Deck
+    rounds: int
+    position: int
+    # None if the question was deleted
+    question_id: Optional[int]
+    scores: dict[int, int]
+    # resolves replies to the current question, None if it was deleted
+    matcher: Optional[AnswerMatcher]
+
+
+class GameEngine:
+    """Quiz games of every chat the bot is in.
+
+    Active sessions are kept in `sessions` by peer id and questions come
+    from the question bank, so an answer is checked without reading the
+    database. Questions are picked from a Deck, so nothing but a position
+    is kept to never repeat one within a game. Only transitions are
+    written: a start right away, since it needs the row id, the next
+    question and the finish through the write-behind buffer.
+    """
+
+    def __init__(self, app: "Application"):
+        self.app = app
+        self.timeout = app.config.bot.question_timeout
+        self.questions_per_game = app.config.bot.questions_per_game
+        self.sessions: dict[int, GameSession] = {}
+        # peers whose session is being created, so /start can't race itself
+        self.starting: set[int] = set()
+
+    @property
+    def bank(self) -> QuestionBank:
+        return self.app.store.quizzes.bank
+
+    @property
+    def selector(self) -> QuestionSelector:
+        return self.app.store.quizzes.selector
+
+    async def restore(self):
+        rows = await GameSessionModel.query.where(
+            GameSessionModel.status == ACTIVE
+        ).gino.all()
+        config = self.app.config.bot
+        if config.mode == "worker":
+            # the other workers restore the games of their own partitions
+            owned = set(config.worker_partitions)
+            rows = [
+                row
+                for row in rows
+                if partition_of(row.peer_id, config.partitions) in owned
+            ]
+        for row in rows:
+            session = GameSession(
+                id=row.id,
+                peer_id=row.peer_id,
+                group_id=row.group_id,
+                theme_id=row.theme_id,
+                deck=Deck(
+                    size=row.deck_size, step=row.deck_step, offset=row.deck_offset
+                ),
+                rounds=row.rounds,
+                position=row.position,
+                question_id=None,
+                scores={int(k): v for k, v in row.scores.items()},
+                matcher=None,
+            )
+            self.ask(session)
+            self.sessions[row.peer_id] = session
+            # the time spent while the bot was down is not counted
+            self.app.store.timers.schedule(row.peer_id, self.timeout)
+
+    def ask(self, session: GameSession):
+        """Picks the question at the position of the session."""
+        session.question_id = self.selector.pick(
+            session.deck, session.position, session.theme_id
+        )
+        session.matcher = self.bank.matchers.get(session.question_id)
+
+    def question_text(self, session: GameSession) -> str:
+        question = self.bank.questions.get(session.question_id)
+        if question is None:
+            return f"Вопрос {session.position + 1} удалён, ждём следующий."
+        lines = [f"Вопрос {session.position + 1}: {question.title}"]
+        lines += [
+            f"{number}. {answer.title}"
+            for number, answer in enumerate(question.answers, start=1)
+        ]
+        return "\n".join(lines)
+
+    def correct_text(self, session: GameSession) -> str:
+        question = self.bank.questions.get(session.question_id)
+        if question is None:
+            return ""
+        return ", ".join(a.title for a in question.answers if a.is_correct)
+
+    @staticmethod
+    def results_text(session: GameSession) -> str:
+        if not session.scores:
+            return "Игра окончена! Правильных ответов не было."
+        scores = sorted(session.scores.items(), key=lambda item: -item[1])
+        lines = ["Игра окончена! Результаты:"]
+        lines += [
+            f"{place}. id{user_id}: {score}"
+            for place, (user_id, score) in enumerate(scores, start=1)
+        ]
+        return "\n".join(lines)
+
+    async def start(
+        self,
+        peer_id: int,
+        group_id: Optional[int] = None,
+        theme_id: Optional[int] = None,
+    ) -> str:
+        if peer_id in self.sessions or peer_id in self.starting:
+            return ALREADY_STARTED
+        self.starting.add(peer_id)
+        try:
+            # writes of another process reach the bank in the background
+            self.app.store.quizzes.refresh_bank_later()
+            deck = self.selector.deck(theme_id)
+            if deck is None:
+                return NO_QUESTIONS
+            rounds = min(deck.size, self.questions_per_game)
+            row = await GameSessionModel.create(
+                peer_id=peer_id,
+                group_id=group_id,
+                status=ACTIVE,
+                theme_id=theme_id,
+                deck_size=deck.size,
+                deck_step=deck.step,
+                deck_offset=deck.offset,
+                rounds=rounds,
+                position=0,
+                scores={},
+            )
+        finally:
+            self.starting.discard(peer_id)
+        session = GameSession(
+            id=row.id,
+            peer_id=peer_id,
+            group_id=group_id,
+            theme_id=theme_id,
+            deck=deck,
+            rounds=rounds,
+            position=0,
+            question_id=None,
+            scores={},
+            matcher=None,
+        )
+        self.ask(session)
+        self.sessions[peer_id] = session
+        self.app.store.timers.schedule(peer_id, self.timeout)
+        return self.question_text(session)
+
+    async def stop(self, peer_id: int) -> str:
+        session = self.sessions.pop(peer_id, None)
+        if session is None:
+            return NOT_STARTED
+        await self.finish(session)
+        return self.results_text(session)
+
+    async def answer(self, peer_id: int, user_id: int, text: str) -> str:
+        session = self.sessions.get(peer_id)
+        if session is None:
+            return NOT_STARTED
+        if session.matcher is None or not session.matcher.is_correct(text):
+            return WRONG
+
+        # the state changes before the first await, so a concurrent answer
+        # to the same question can't be scored twice
+        session.scores[user_id] = session.scores.get(user_id, 0) + 1
+        text = f"{RIGHT}\n{await self.next_question(session)}"
+        await self.app.store.leaderboard.add(peer_id, user_id)
+        return text
+
+    async def expire(self, peer_id: int) -> Optional[str]:
+        """Moves on when nobody answered the question in time."""
+        session = self.sessions.get(peer_id)
+        if session is None:
+            return None
+        correct = self.correct_text(session)
+        return f"{TIME_IS_UP} {correct}\n{await self.next_question(session)}"
+
+    async def next_question(self, session: GameSession) -> str:
+        session.position += 1
+        if session.position >= session.rounds:
+            del self.sessions[session.peer_id]
+            await self.finish(session)
+            return self.results_text(session)
+
+        self.ask(session)
+        self.app.store.timers.schedule(session.peer_id, self.timeout)
+        await self.save(session, ACTIVE)
+        return self.question_text(session)
+
+    async def finish(self, session: GameSession):
+        self.app.store.timers.cancel(session.peer_id)
+        await self.save(session, FINISHED, finished_at=datetime.utcnow())
+
+    async def save(
+        self, session: GameSession, status: str, finished_at: Optional[datetime] = None
+    ):
+        await self.app.database.buffer.put(
+            GAME_SESSIONS,
+            {
+                "id": session.id,
+                "peer_id": session.peer_id,
+                "group_id": session.group_id,
+                "status": status,
+                "theme_id": session.theme_id,
+                "deck_size": session.deck.size,
+                "deck_step": session.deck.step,
+                "deck_offset": session.deck.offset,
+                "rounds": session.rounds,
+                "position": session.position,
+                # copied, the buffered row must not change with the session
+                "scores": dict(session.scores),
+                "finished_at": finished_at,
+            },
+        )
@@ -1,23 +1,92 @@
+import asyncio
 import typing
 from logging import getLogger
 
+from app.store.bot.game import GameEngine
 from app.store.vk_api.dataclasses import Update, Message
 
 if typing.TYPE_CHECKING:
     from app.web.app import Application
 
+START = "/start"
+STOP = "/stop"
+TOP = "/top"
+HELP_COMMAND = "/help"
+# peer ids of group chats start here, smaller ones are dialogs with a user
+CHAT_PEER_ID = 2000000000
+HELP = (
+    "Привет! Напишите /start, чтобы начать викторину, или /start и номер темы, "
+    "/stop, чтобы закончить, и /top, чтобы увидеть лучших игроков чата."
+)
+
 
 class BotManager:
     def __init__(self, app: "Application"):
         self.app = app
         self.bot = None
         self.logger = getLogger("handler")
+        self.games = GameEngine(app)
+        app.on_startup.append(self.connect)
+
+    async def connect(self, app: "Application"):
+        # the ingest process only publishes updates, workers play the games
+        if app.config.bot.mode != "ingest":
+            await self.games.restore()
 
     async def handle_updates(self, updates: list[Update]):
         for update in updates:
-            await self.app.store.vk_api.send_message(
-                Message(
-                    user_id=update.object.user_id,
-                    text="Привет!",
-                )
+            await self.handle_update(update)
+
+    async def handle_update(self, update: Update):
+        peer_id = update.object.chat_id
+        command, _, argument = update.object.body.strip().lower().partition(" ")
+        argument = argument.strip()
+        if command == START and (not argument or argument.isdigit()):
+            theme_id = int(argument) if argument else None
+            text = await self.games.start(peer_id, update.group_id, theme_id)
+        elif command == STOP and not argument:
+            text = await self.games.stop(peer_id)
+        elif command == TOP and not argument:
+            text = self.top_text(peer_id)
+        elif peer_id in self.games.sessions:
+            text = await self.games.answer(
+                peer_id, update.object.user_id, update.object.body
+            )
+        elif command == HELP_COMMAND or peer_id < CHAT_PEER_ID:
+            text = HELP
+        else:
+            # members of a chat talk to each other, only commands are answered
+            return
+        await self.app.store.vk_api.send_message(
+            Message(
+                user_id=update.object.user_id,
+                text=text,
+                group_id=update.group_id,
+                peer_id=update.object.peer_id,
+            )
+        )
+
+    def top_text(self, peer_id: int) -> str:
+        scores = self.app.store.leaderboard.board(peer_id).top(limit=10)
+        if not scores:
+            return "В этом чате ещё никто не отвечал правильно."
+        lines = ["Лучшие игроки чата:"]
+        lines += [f"{s.place}. id{s.user_id}: {s.score}" for s in scores]
+        return "\n".join(lines)
+
+    async def handle_timeouts(self, peer_ids: list[int]):
+        await asyncio.gather(*(self.handle_timeout(peer_id) for peer_id in peer_ids))
+
+    async def handle_timeout(self, peer_id: int):
+        session = self.games.sessions.get(peer_id)
+        text = await self.games.expire(peer_id)
+        if text is None:
+            return
+        await self.app.store.vk_api.send_message(
+            Message(
+                user_id=peer_id,
+                text=text,
+                group_id=session.group_id,
+                peer_id=peer_id,
             )
+        )
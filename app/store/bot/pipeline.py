@@ -0,0 +1,310 @@
+import asyncio
+import time
+from asyncio import Task
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+from logging import getLogger
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import Interval, cast, func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.bot.models import SeenUpdateModel
+from app.store.database.gino import db
+from app.store.vk_api.dataclasses import Update, UpdateBatch
+
+if TYPE_CHECKING:
+    from app.web.config import BotConfig
+
+Source = Callable[[], Awaitable[UpdateBatch]]
+Handler = Callable[[Update], Awaitable[None]]
+# a stage gets the update and the rest of the chain, like an aiohttp
+# middleware, and drops the update by not calling it
+Stage = Callable[[Update, Handler], Awaitable[None]]
+
+# one statement for a batch of any size, the arrays are single parameters
+SEEN_UPDATES = db.text(
+    """
+    SELECT seen.group_id, seen.peer_id, seen.conversation_message_id
+    FROM unnest(
+        CAST(:group_ids AS bigint[]),
+        CAST(:peer_ids AS bigint[]),
+        CAST(:numbers AS bigint[])
+    ) AS batch (group_id, peer_id, conversation_message_id)
+    JOIN seen_updates AS seen USING (group_id, peer_id, conversation_message_id)
+    """
+)
+
+
+@dataclass
+class PendingBatch:
+    ts: int
+    remaining: int
+
+
+@dataclass
+class PipelineStats:
+    received: int = 0
+    handled: int = 0
+    failed: int = 0
+    handle_time: float = 0
+
+
+class Metrics:
+    def __init__(self):
+        self.stats = PipelineStats()
+
+    async def __call__(self, update: Update, handler: Handler):
+        self.stats.received += 1
+        started = time.monotonic()
+        try:
+            await handler(update)
+        except Exception:
+            self.stats.failed += 1
+            raise
+        else:
+            self.stats.handled += 1
+        finally:
+            self.stats.handle_time += time.monotonic() - started
+
+
+class Dedup:
+    """Drops updates that were handled before, across restarts too.
+
+    An update is keyed by its group, peer and conversation message id: in
+    group chats VK sends id 0 for every message. A batch is checked against
+    the seen_updates table with one query before it is queued, and a key is
+    written there once its handler succeeded. So updates replayed from an
+    older checkpoint, by the long poll or by the work log, are dropped when
+    they were handled, and handled when they were not: never queued, cut
+    short by a crash or failed. Keys are kept for `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 3600, prune_interval: float = 60):
+        self.ttl = timedelta(seconds=ttl)
+        self.prune_interval = prune_interval
+        self.pruned_at = time.monotonic()
+        # keys queued and not handled yet, a replay of them must wait
+        self.pending: set[tuple[int, int, int]] = set()
+        self.dropped = 0
+        self.logger = getLogger("dedup")
+
+    @staticmethod
+    def key(update: Update) -> tuple[int, int, int]:
+        obj = update.object
+        number = obj.conversation_message_id
+        return (
+            update.group_id or 0,
+            obj.chat_id,
+            obj.id if number is None else number,
+        )
+
+    async def filter(self, updates: list[Update]) -> list[Update]:
+        if not updates:
+            return updates
+        keys = {}
+        for update in updates:
+            key = self.key(update)
+            # the first of the same message in a batch is the one handled
+            if key not in self.pending:
+                keys.setdefault(key, update)
+        while True:
+            try:
+                seen = await self.seen(list(keys))
+                break
+            except Exception as e:
+                # the batch is already fetched, it can only wait for the check
+                self.logger.error("Exception", exc_info=e)
+                await asyncio.sleep(1)
+        fresh = [update for key, update in keys.items() if key not in seen]
+        self.pending.update(self.key(update) for update in fresh)
+        self.dropped += len(updates) - len(fresh)
+        if time.monotonic() - self.pruned_at >= self.prune_interval:
+            self.pruned_at = time.monotonic()
+            await self.prune()
+        return fresh
+
+    async def seen(self, keys: list[tuple[int, int, int]]) -> set[tuple]:
+        if not keys:
+            return set()
+        rows = await db.all(
+            SEEN_UPDATES,
+            group_ids=[key[0] for key in keys],
+            peer_ids=[key[1] for key in keys],
+            numbers=[key[2] for key in keys],
+        )
+        return {tuple(row) for row in rows}
+
+    def release(self, update: Update):
+        """Forgets an update that was filtered but never handled."""
+        self.pending.discard(self.key(update))
+
+    async def done(self, update: Update, handled: bool):
+        key = self.key(update)
+        self.pending.discard(key)
+        if not handled:
+            return
+        query = insert(SeenUpdateModel.__table__).values(
+            group_id=key[0], peer_id=key[1], conversation_message_id=key[2]
+        )
+        try:
+            await db.status(query.on_conflict_do_nothing())
+        except Exception as e:
+            # the update may be handled again if it is ever replayed
+            self.logger.error("Exception", exc_info=e)
+
+    async def prune(self):
+        expired = func.now() - cast(self.ttl, Interval)
+        try:
+            await SeenUpdateModel.delete.where(
+                SeenUpdateModel.seen_at < expired
+            ).gino.status()
+        except Exception as e:
+            self.logger.error("Exception", exc_info=e)
+
+
+class UserRateLimit:
+    """Drops updates of a user beyond `limit` per `period` seconds."""
+
+    def __init__(self, limit: int, period: float = 1):
+        self.limit = limit
+        self.period = period
+        self.window_start = time.monotonic()
+        # counts of the current window only, so the dict can't grow unbounded
+        self.counts: dict[int, int] = {}
+        self.dropped = 0
+
+    async def __call__(self, update: Update, handler: Handler):
+        now = time.monotonic()
+        if now - self.window_start >= self.period:
+            self.window_start = now
+            self.counts.clear()
+        user_id = update.object.user_id
+        count = self.counts.get(user_id, 0) + 1
+        self.counts[user_id] = count
+        if count > self.limit:
+            self.dropped += 1
+            return
+        await handler(update)
+
+
+def default_stages(config: "BotConfig") -> list[Stage]:
+    stages = [Metrics()]
+    if config.user_rate_limit:
+        stages.append(UserRateLimit(config.user_rate_limit))
+    return stages
+
+
+class Pipeline:
+    """Moves updates from a source through the stages to the handler.
+
+    The update objects of a batch are passed along as they are, and the
+    stage chain is built once, so a stage costs no per-update allocation.
+    `dedup` filters a whole batch before it is queued. `on_processed` is the
+    sink of the ts whose updates are all handled.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        handler: Handler,
+        stages: Iterable[Stage] = (),
+        workers: int = 1,
+        queue_size: int = 100,
+        on_processed: Optional[Callable[[int], None]] = None,
+        dedup: Optional[Dedup] = None,
+        retry_delay: float = 1,
+    ):
+        self.source = source
+        self.dedup = dedup
+        self.retry_delay = retry_delay
+        self.stages = list(stages)
+        self.handler = handler
+        for stage in reversed(self.stages):
+            self.handler = partial(stage, handler=self.handler)
+        self.is_running = False
+        self.poll_task: Optional[Task] = None
+        self.logger = getLogger("pipeline")
+        # one bounded queue per worker: updates of the same chat always land
+        # in the same queue, so they are handled in the order they arrived
+        self.queues: list[asyncio.Queue] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self.worker_tasks: list[Task] = []
+        self.batches: deque[PendingBatch] = deque()
+        self.processed_ts: Optional[int] = None
+        self.on_processed = on_processed
+
+    async def start(self):
+        self.is_running = True
+        self.worker_tasks = [
+            asyncio.create_task(self.work(queue)) for queue in self.queues
+        ]
+        self.poll_task = asyncio.create_task(self.poll())
+
+    async def stop(self):
+        self.is_running = False
+        if self.poll_task:
+            self.poll_task.cancel()
+            await asyncio.gather(self.poll_task, return_exceptions=True)
+        for queue in self.queues:
+            await queue.join()
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+
+    async def poll(self):
+        while self.is_running:
+            try:
+                batch = await self.source()
+            except Exception as e:
+                # a bad payload or a failed query must not end polling
+                self.logger.error("Exception", exc_info=e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            updates = batch.updates
+            if self.dedup:
+                updates = await self.dedup.filter(updates)
+            # the extra 1 keeps the batch open until every update is queued
+            pending = PendingBatch(ts=batch.ts, remaining=len(updates) + 1)
+            self.batches.append(pending)
+            for position, update in enumerate(updates):
+                try:
+                    await self.put(update, pending)
+                except BaseException:
+                    # stopped while a queue was full: the rest is handled
+                    # when the batch is replayed
+                    if self.dedup:
+                        for rest in updates[position:]:
+                            self.dedup.release(rest)
+                    raise
+            self.done(pending)
+
+    async def put(self, update: Update, pending: PendingBatch):
+        queue = self.queues[update.object.chat_id % len(self.queues)]
+        await queue.put((update, pending))
+
+    def done(self, pending: PendingBatch):
+        pending.remaining -= 1
+        # a ts is processed once its batch and every batch before it are done
+        while self.batches and self.batches[0].remaining == 0:
+            self.processed_ts = self.batches.popleft().ts
+            if self.on_processed:
+                self.on_processed(self.processed_ts)
+
+    async def work(self, queue: asyncio.Queue):
+        while True:
+            update, pending = await queue.get()
+            handled = False
+            try:
+                await self.handler(update)
+                handled = True
+            except Exception as e:
+                self.logger.error("Exception", exc_info=e)
+            finally:
+                if self.dedup:
+                    await self.dedup.done(update, handled)
+                self.done(pending)
+                queue.task_done()
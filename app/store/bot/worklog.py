@@ -0,0 +1,196 @@
+import asyncio
+import itertools
+from asyncio import Task
+from collections import deque
+from datetime import timedelta
+from logging import getLogger
+from typing import Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import (
+    ARRAY,
+    BigInteger,
+    Interval,
+    and_,
+    any_,
+    bindparam,
+    cast,
+    func,
+    or_,
+    select,
+)
+
+from app.bot.models import UpdateLogModel
+from app.store.vk_api.checkpoint import CheckpointStore
+from app.store.vk_api.dataclasses import Update, UpdateBatch, UpdateObject
+
+
+def partition_of(chat_id: int, partitions: int) -> int:
+    # games are kept by chat, so every update of a chat goes to one worker
+    return chat_id % partitions
+
+
+def update_to_payload(update: Update) -> dict:
+    return {
+        "type": update.type,
+        "object": update.object._asdict(),
+        "group_id": update.group_id,
+    }
+
+
+def update_from_payload(payload: dict) -> Update:
+    return Update(
+        type=payload["type"],
+        object=UpdateObject(**payload["object"]),
+        group_id=payload["group_id"],
+    )
+
+
+class WorkLog(CheckpointStore):
+    """Postgres table the ingest process hands updates over to workers.
+
+    Updates are partitioned by chat. Every partition must be owned by one
+    worker, so the updates of a chat are handled in order: the ingest process
+    publishes without owning any. A worker checkpoints the last handled id
+    through `save`, which deletes the rows it claimed up to that id. The rows
+    of a worker that died are claimed again once their lease is over, and
+    Dedup drops only those the dead worker finished handling.
+    """
+
+    def __init__(
+        self,
+        partitions: int,
+        worker_partitions: Iterable[int] = (),
+        batch_size: int = 100,
+        poll_interval: float = 0.1,
+        lease: float = 60,
+    ):
+        self.partitions = partitions
+        self.worker_partitions = sorted(worker_partitions)
+        if not set(self.worker_partitions) <= set(range(partitions)):
+            raise ValueError(
+                f"worker partitions {self.worker_partitions} "
+                f"are not all in range({partitions})"
+            )
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        # ids claimed by this worker and not deleted yet, in claim order
+        self.claimed: deque[int] = deque()
+
+    def partition_of(self, update: Update) -> int:
+        return partition_of(update.object.chat_id, self.partitions)
+
+    async def publish(self, updates: list[Update]):
+        if not updates:
+            return
+        await UpdateLogModel.insert().gino.all(
+            [
+                {
+                    "partition": self.partition_of(update),
+                    "payload": update_to_payload(update),
+                }
+                for update in updates
+            ]
+        )
+
+    async def claim(self) -> list[tuple[int, Update]]:
+        # rows claimed by a worker that died become claimable after the lease
+        expired = func.now() - cast(self.lease, Interval)
+        claimable = select([UpdateLogModel.id]).where(
+            and_(
+                UpdateLogModel.partition.in_(self.worker_partitions),
+                or_(
+                    UpdateLogModel.claimed_at.is_(None),
+                    UpdateLogModel.claimed_at < expired,
+                ),
+            )
+        )
+        claimable = (
+            claimable.order_by(UpdateLogModel.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = (
+            await UpdateLogModel.update.values(claimed_at=func.now())
+            .where(UpdateLogModel.id.in_(claimable))
+            .returning(UpdateLogModel.id, UpdateLogModel.payload)
+            .gino.all()
+        )
+        claimed = sorted((row.id, update_from_payload(row.payload)) for row in rows)
+        self.claimed.extend(id_ for id_, _ in claimed)
+        return claimed
+
+    async def ack(self, last_id: int):
+        """Deletes the rows this worker claimed up to `last_id`.
+
+        Rows of other workers are never touched, even below `last_id`: if
+        their worker dies, the lease hands them out again.
+        """
+        ids = list(itertools.takewhile(lambda id_: id_ <= last_id, self.claimed))
+        if not ids:
+            return
+        await UpdateLogModel.delete.where(
+            UpdateLogModel.id == any_(bindparam("ids", ids, ARRAY(BigInteger)))
+        ).gino.status()
+        for _ in ids:
+            self.claimed.popleft()
+
+    async def load(self, group_id: int) -> Optional[int]:
+        return None
+
+    async def save(self, group_id: int, ts: int):
+        await self.ack(ts)
+
+    async def poll(self) -> UpdateBatch:
+        """Source for a Pipeline: waits for claimed updates, ts is the last id."""
+        while True:
+            claimed = await self.claim()
+            if claimed:
+                return UpdateBatch(
+                    ts=claimed[-1][0], updates=[update for _, update in claimed]
+                )
+            await asyncio.sleep(self.poll_interval)
+
+
+class Ingester:
+    """Publishes every long-poll batch to the work log instead of handling it."""
+
+    def __init__(
+        self,
+        source: Callable[[], Awaitable[UpdateBatch]],
+        worklog: WorkLog,
+        on_processed: Optional[Callable[[int], None]] = None,
+        retry_delay: float = 1,
+    ):
+        self.source = source
+        self.worklog = worklog
+        self.on_processed = on_processed
+        self.retry_delay = retry_delay
+        self.task: Optional[Task] = None
+        self.logger = getLogger("ingester")
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def run(self):
+        while True:
+            try:
+                batch = await self.source()
+            except Exception as e:
+                self.logger.error("Exception", exc_info=e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            while True:
+                try:
+                    await self.worklog.publish(batch.updates)
+                    break
+                except Exception as e:
+                    self.logger.error("Exception", exc_info=e)
+                    await asyncio.sleep(self.retry_delay)
+            if self.on_processed:
+                self.on_processed(batch.ts)
@@ -0,0 +1,211 @@
+import asyncio
+from asyncio import Task
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Callable, Hashable, Iterator, Optional
+
+from asyncpg import PostgresError
+from sqlalchemy import Table
+from sqlalchemy.dialects.postgresql import insert
+
+from app.store.database.gino import db
+
+# asyncpg sends at most this many arguments with a single statement
+MAX_ARGUMENTS = 32767
+
+
+@dataclass(frozen=True)
+class Channel:
+    """Rows of one table written by a WriteBehindBuffer.
+
+    With `key` set, rows with the same key are coalesced in the buffer by
+    `merge` (the newer row wins by default) and upserted on flush, setting
+    the columns `update` returns for the insert statement.
+    """
+
+    table: Table
+    key: tuple[str, ...] = ()
+    update: Optional[Callable] = None
+    merge: Optional[Callable[[dict, dict], dict]] = None
+
+
+class WriteBehindBuffer:
+    """Collects rows in memory and writes them with one statement per table,
+    split where a table has more rows than asyncpg takes arguments.
+
+    Rows are flushed every `flush_interval` seconds or once `flush_size`
+    are waiting. `put` blocks while `max_size` rows are waiting, so a slow
+    database slows the producers down instead of growing the buffer.
+
+    Every statement is written on its own, so a row the database rejects
+    only holds back the rows of its statement. Once a statement failed
+    `max_attempts` times its rows are written one by one, and the rejected
+    ones are logged and dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        flush_size: int = 1000,
+        flush_interval: float = 1,
+        max_attempts: int = 3,
+    ):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.rows: dict[Channel, dict] = {}
+        self.size = 0
+        self.attempts: dict[tuple[Channel, Hashable], int] = {}
+        # made on the running loop, an Event binds to a loop on Python 3.9
+        self.full: Optional[asyncio.Event] = None
+        self.drained: Optional[asyncio.Event] = None
+        self.task: Optional[Task] = None
+        self.logger = getLogger("buffer")
+
+    async def start(self):
+        self._make_events()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stops the writer and writes what is left."""
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await self.flush()
+
+    async def put(self, channel: Channel, row: dict):
+        self._make_events()
+        while self.size >= self.max_size:
+            await self.drained.wait()
+        rows = self.rows.setdefault(channel, {})
+        if not channel.key:
+            # a unique object as the key never coalesces
+            rows[object()] = row
+        else:
+            key = tuple(row[column] for column in channel.key)
+            if key in rows:
+                old = rows[key]
+                rows[key] = channel.merge(old, row) if channel.merge else row
+                return
+            rows[key] = row
+        self.size += 1
+        if self.size >= self.max_size:
+            self.drained.clear()
+        if self.size >= self.flush_size:
+            self.full.set()
+
+    async def run(self):
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+            except Exception as e:
+                self.logger.error("Exception", exc_info=e)
+
+    async def flush(self):
+        """Writes the waiting rows, raises the first error after writing
+        every statement that did not fail."""
+        self._make_events()
+        self.full.clear()
+        if not self.size:
+            return
+        batches, self.rows, self.size = self.rows, {}, 0
+        pending = [
+            (channel, chunk)
+            for channel, rows in batches.items()
+            for chunk in self._chunks(list(rows.items()))
+        ]
+        error = None
+        try:
+            while pending:
+                channel, chunk = pending[0]
+                try:
+                    await db.status(
+                        self._statement(channel, [row for _, row in chunk])
+                    )
+                except PostgresError as e:
+                    error = error or e
+                    if self._count_attempt(channel, chunk) >= self.max_attempts:
+                        await self._write_one_by_one(channel, chunk)
+                    for key, row in chunk:
+                        self._restore(channel, key, row)
+                else:
+                    for key, _ in chunk:
+                        self.attempts.pop((channel, key), None)
+                pending.pop(0)
+        except BaseException:
+            # keep the rows not written, also when the writer is cancelled
+            # mid-flush, merged with the ones buffered meanwhile
+            for channel, chunk in pending:
+                for key, row in chunk:
+                    self._restore(channel, key, row)
+            raise
+        finally:
+            if self.size < self.max_size:
+                self.drained.set()
+        if error is not None:
+            raise error
+
+    def _make_events(self):
+        if self.full is not None:
+            return
+        self.full = asyncio.Event()
+        self.drained = asyncio.Event()
+        if self.size >= self.flush_size:
+            self.full.set()
+        if self.size < self.max_size:
+            self.drained.set()
+
+    def _count_attempt(self, channel: Channel, chunk: list) -> int:
+        attempts = 0
+        for key, _ in chunk:
+            count = self.attempts.get((channel, key), 0) + 1
+            self.attempts[channel, key] = count
+            attempts = max(attempts, count)
+        return attempts
+
+    async def _write_one_by_one(self, channel: Channel, chunk: list):
+        # written and dropped rows leave the chunk, the rest is kept
+        while chunk:
+            key, row = chunk[0]
+            try:
+                await db.status(self._statement(channel, [row]))
+            except PostgresError as e:
+                self.logger.error(
+                    "Dropping %s row %s after %d attempts",
+                    channel.table.name,
+                    row,
+                    self.attempts[channel, key],
+                    exc_info=e,
+                )
+            self.attempts.pop((channel, key), None)
+            chunk.pop(0)
+
+    def _restore(self, channel: Channel, key: Hashable, row: dict):
+        rows = self.rows.setdefault(channel, {})
+        if key not in rows:
+            rows[key] = row
+            self.size += 1
+        elif channel.merge:
+            rows[key] = channel.merge(row, rows[key])
+
+    @staticmethod
+    def _chunks(rows: list[tuple]) -> Iterator[list[tuple]]:
+        # a statement takes an argument per column of every row
+        size = MAX_ARGUMENTS // max(len(row) for _, row in rows)
+        for start in range(0, len(rows), size):
+            yield rows[start : start + size]
+
+    @staticmethod
+    def _statement(channel: Channel, rows: list[dict]):
+        query = insert(channel.table).values(rows)
+        if channel.key:
+            query = query.on_conflict_do_update(
+                index_elements=list(channel.key), set_=channel.update(query)
+            )
+        return query
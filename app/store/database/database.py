@@ -2,7 +2,11 @@ import gino
 from gino.api import Gino
 from app.store.database.gino import db
 from app.admin.models import *
+from app.bot.models import *
+from app.leaderboard.models import *
 from app.quiz.models import *
+from app.store.database.buffer import WriteBehindBuffer
+from app.store.database.pool import ConnectionPoolStats
 from sqlalchemy.engine.url import URL
 
 
@@ -12,24 +16,53 @@ class Database:
     def __init__(self, app: "Application"):
         self.app = app
         self.db: Optional[Gino] = None
+        config = app.config.database
+        self.buffer = WriteBehindBuffer(
+            max_size=config.buffer_size,
+            flush_size=config.buffer_flush_size,
+            flush_interval=config.buffer_flush_interval,
+            max_attempts=config.buffer_max_attempts,
+        )
+        self.pool_stats = ConnectionPoolStats(
+            min_size=config.pool_min_size, max_size=config.pool_max_size
+        )
 
     async def connect(self, *_, **kw):
+        config = self.app.config.database
+        self.pool_stats = ConnectionPoolStats(
+            min_size=config.pool_min_size, max_size=config.pool_max_size
+        )
+        # asyncpg opens min_size connections before the engine is returned
         self._engine = await gino.create_engine(
             URL(
                 drivername="asyncpg",
-                host=self.app.config.database.host,
-                database=self.app.config.database.database,
-                username=self.app.config.database.user,
-                password=self.app.config.database.password,
-                port=self.app.config.database.port,
+                host=config.host,
+                database=config.database,
+                username=config.user,
+                password=config.password,
+                port=config.port,
             ),
-            min_size=1,
-            max_size=1,
+            min_size=config.pool_min_size,
+            max_size=config.pool_max_size,
+            max_queries=config.pool_max_queries,
+            max_inactive_connection_lifetime=config.pool_max_inactive_lifetime,
+            statement_cache_size=config.statement_cache_size,
+            command_timeout=config.command_timeout,
+            setup=self.pool_stats.on_acquire,
         )
+        self.pool_stats.pool = self._engine.raw_pool
 
         self.db = db
         self.db.bind = self._engine
+        await self.buffer.start()
 
     async def disconnect(self, *_, **kw):
-        # await self.db.pop_bind().close()
-        return
+        # runs after every accessor stopped, so nothing is buffered later
+        try:
+            await self.buffer.stop()
+        finally:
+            if self.db is not None and self.db.bind is self._engine:
+                self.db.pop_bind()
+            if self.pool_stats.pool is not None:
+                await self._engine.close()
+                self.pool_stats.pool = None
@@ -0,0 +1,43 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from asyncpg import Pool
+
+
+@dataclass
+class ConnectionPoolStats:
+    """Connections of the database pool.
+
+    Acquires are counted by the asyncpg `setup` callback, the connection
+    counts are read from the pool whenever they are looked at.
+    """
+
+    min_size: int
+    max_size: int
+    acquired: int = 0
+    # acquires that took the last free connection of a full pool: the
+    # pool is saturated and the next acquires wait for a release
+    exhausted: int = 0
+    pool: Optional[Pool] = field(default=None, repr=False, compare=False)
+
+    @property
+    def size(self) -> int:
+        return self.pool.get_size() if self.pool is not None else 0
+
+    @property
+    def idle(self) -> int:
+        return self.pool.get_idle_size() if self.pool is not None else 0
+
+    @property
+    def in_use(self) -> int:
+        return self.size - self.idle
+
+    @property
+    def saturation(self) -> float:
+        return self.in_use / self.max_size
+
+    async def on_acquire(self, conn):
+        self.acquired += 1
+        # the connection being handed out still counts as idle here
+        if self.size >= self.max_size and self.idle <= 1:
+            self.exhausted += 1
@@ -0,0 +1,75 @@
+import typing
+from typing import Optional
+
+from app.base.base_accessor import BaseAccessor
+from app.leaderboard.models import Score, ScoreModel
+from app.store.database.gino import db
+from app.store.database.buffer import Channel
+from app.store.leaderboard.board import Leaderboard
+
+if typing.TYPE_CHECKING:
+    from app.web.app import Application
+
+# deltas of the same chat and user add up in the buffer and in the table
+SCORES = Channel(
+    table=ScoreModel.__table__,
+    key=("peer_id", "user_id"),
+    update=lambda query: {"score": ScoreModel.score + query.excluded.score},
+    merge=lambda old, new: {**new, "score": old["score"] + new["score"]},
+)
+
+
+class LeaderboardAccessor(BaseAccessor):
+    """Per-chat leaderboards served from memory, pages of any board from SQL.
+
+    A chat is handled by one process, so its board only changes through
+    `add` there and the bot reads it from memory. The global board and the
+    admin pages sum up every process's writes, they are read from `scores`.
+    """
+
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.boards: dict[int, Leaderboard] = {}
+
+    async def connect(self, app: "Application"):
+        await self.load()
+
+    async def load(self):
+        scores: dict[int, dict[int, int]] = {}
+        for row in await ScoreModel.query.gino.all():
+            scores.setdefault(row.peer_id, {})[row.user_id] = row.score
+        self.boards = {}
+        for peer_id, peer_scores in scores.items():
+            self.boards[peer_id] = Leaderboard()
+            self.boards[peer_id].load(peer_scores)
+
+    def board(self, peer_id: int) -> Leaderboard:
+        return self.boards.get(peer_id) or Leaderboard()
+
+    async def page(
+        self, peer_id: Optional[int] = None, offset: int = 0, limit: int = 10
+    ) -> tuple[int, list[Score]]:
+        """Number of players and a page of the top, the global board if
+        peer_id is not set."""
+        # this process's own deltas are still in the buffer
+        await self.app.database.buffer.flush()
+        score = db.func.sum(ScoreModel.score).label("score")
+        query = db.select([ScoreModel.user_id, score]).group_by(ScoreModel.user_id)
+        if peer_id is not None:
+            query = query.where(ScoreModel.peer_id == peer_id)
+        players = db.select([db.func.count()]).select_from(query.alias())
+        total = await players.gino.scalar()
+        query = query.order_by(score.desc(), ScoreModel.user_id)
+        rows = await query.offset(offset).limit(limit).gino.all()
+        return total, [
+            Score(place=place, user_id=row.user_id, score=row.score)
+            for place, row in enumerate(rows, start=offset + 1)
+        ]
+
+    async def add(self, peer_id: int, user_id: int, delta: int = 1):
+        if peer_id not in self.boards:
+            self.boards[peer_id] = Leaderboard()
+        self.boards[peer_id].add(user_id, delta)
+        await self.app.database.buffer.put(
+            SCORES, {"peer_id": peer_id, "user_id": user_id, "score": delta}
+        )
@@ -0,0 +1,46 @@
+from bisect import bisect_left, insort
+from typing import Optional
+
+from app.leaderboard.models import Score
+
+
+class Leaderboard:
+    """Scores of one chat, or of every chat, kept in ranking order.
+
+    `ranking` is a sorted list of (-score, user_id), so a score change is
+    two binary searches plus a memmove, and a page of the top is a slice.
+    """
+
+    def __init__(self):
+        self.scores: dict[int, int] = {}
+        self.ranking: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def load(self, scores: dict[int, int]):
+        self.scores = dict(scores)
+        self.ranking = sorted((-score, user_id) for user_id, score in scores.items())
+
+    def add(self, user_id: int, delta: int = 1) -> int:
+        old = self.scores.get(user_id)
+        if old is not None:
+            del self.ranking[bisect_left(self.ranking, (-old, user_id))]
+        score = (old or 0) + delta
+        self.scores[user_id] = score
+        insort(self.ranking, (-score, user_id))
+        return score
+
+    def top(self, offset: int = 0, limit: int = 10) -> list[Score]:
+        return [
+            Score(place=place, user_id=user_id, score=-score)
+            for place, (score, user_id) in enumerate(
+                self.ranking[offset : offset + limit], start=offset + 1
+            )
+        ]
+
+    def place(self, user_id: int) -> Optional[int]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self.ranking, (-score, user_id)) + 1
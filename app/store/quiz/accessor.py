@@ -1,4 +1,10 @@
-from typing import Optional
+import asyncio
+import typing
+from asyncio import Task
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.base.base_accessor import BaseAccessor
 from app.quiz.models import (
@@ -8,13 +14,103 @@ from app.quiz.models import (
     ThemeModel,
     QuestionModel,
     AnswerModel,
+    QuizVersionModel,
 )
+from app.store.database.gino import db
+from app.store.quiz.bank import QuestionBank
+from app.store.quiz.cache import ThemeCache
+from app.store.quiz.selector import QuestionSelector
 from typing import List
 
+if typing.TYPE_CHECKING:
+    from app.web.app import Application
+
+# rows of quiz_version
+QUESTIONS_VERSION = 1
+THEMES_VERSION = 2
+
+# data-modifying CTEs: the question, its answers and the quiz version bump
+# in one round-trip, and atomic as a single statement
+CREATE_QUESTION = db.text(
+    """
+    WITH question AS (
+        INSERT INTO questions (title, theme_id) VALUES (:title, :theme_id)
+        RETURNING id
+    ), answers AS (
+        INSERT INTO answers (title, is_correct, question_id)
+        SELECT answer.title, answer.is_correct, question.id
+        FROM question, unnest(
+            CAST(:titles AS varchar[]), CAST(:correct AS boolean[])
+        ) AS answer (title, is_correct)
+    ), version AS (
+        INSERT INTO quiz_version (id, version) VALUES (1, 1)
+        ON CONFLICT (id) DO UPDATE SET version = quiz_version.version + 1
+        RETURNING version
+    )
+    SELECT question.id, version.version FROM question, version
+    """
+)
+
 
 class QuizAccessor(BaseAccessor):
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.bank = QuestionBank(max_distance=app.config.bot.answer_max_distance)
+        self.selector = QuestionSelector(self.bank)
+        self.themes = ThemeCache()
+        self.refresh_task: Optional[Task] = None
+
+    async def connect(self, app: "Application"):
+        await super().connect(app)
+        await self.refresh_bank()
+
+    async def disconnect(self, app: "Application"):
+        if self.refresh_task:
+            self.refresh_task.cancel()
+            await asyncio.gather(self.refresh_task, return_exceptions=True)
+        await super().disconnect(app)
+
+    async def get_version(self, id_: int = QUESTIONS_VERSION) -> int:
+        version = (
+            await QuizVersionModel.select("version")
+            .where(QuizVersionModel.id == id_)
+            .gino.scalar()
+        )
+        return version or 0
+
+    async def bump_version(self, id_: int = QUESTIONS_VERSION) -> int:
+        query = insert(QuizVersionModel.__table__).values(id=id_, version=1)
+        query = query.on_conflict_do_update(
+            index_elements=[QuizVersionModel.id],
+            set_={"version": QuizVersionModel.version + 1},
+        ).returning(QuizVersionModel.version)
+        return await db.scalar(query)
+
+    async def refresh_bank(self):
+        """Reloads the question bank if another process changed questions."""
+        version = await self.get_version()
+        if version != self.bank.version:
+            self.bank.load(await self.list_questions(), version)
+
+    def refresh_bank_later(self):
+        """Starts refresh_bank in the background, unless it is running.
+
+        A reload reads every question and builds every matcher, so the bot
+        doesn't wait for it: games go on with the bank as it is until then.
+        """
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.create_task(self._refresh_bank())
+
+    async def _refresh_bank(self):
+        try:
+            await self.refresh_bank()
+        except Exception as e:
+            self.logger.error("Exception", exc_info=e)
+
     async def create_theme(self, title: str) -> Theme:
-        obj = await ThemeModel.create(title=title)
+        async with db.transaction():
+            obj = await ThemeModel.create(title=title)
+            await self.bump_version(THEMES_VERSION)
         return obj.to_dc()
 
     async def get_theme_by_title(self, title: str) -> Optional[Theme]:
@@ -25,33 +121,107 @@ class QuizAccessor(BaseAccessor):
         obj = await ThemeModel.get(id_)
         return None if obj is None else obj.to_dc()
 
-    async def list_themes(self) -> List[Theme]:
-        objs = await ThemeModel.query.gino.all()
-        return [o.to_dc() for o in objs]
-
-    async def create_answers(self, question_id, answers: List[Answer]):
-        await AnswerModel.insert().gino.all(
-            [
-                {
-                    'title': a.title,
-                    'is_correct': a.is_correct,
-                    'question_id': question_id
+    async def list_themes(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[Theme]:
+        """Themes ordered by id, the page after `after_id` if `limit` is set.
 
-                }
-                for a in answers
-            ]
-        )
+        Themes are few and rarely change, so the whole list is read once and
+        pages are cut from the cache until a process creates a theme.
+        """
+        version = await self.get_version(THEMES_VERSION)
+        if not self.themes.is_current(version):
+            # read after the version: a theme created meanwhile bumps it
+            # again, so the list is read once more on the next call
+            objs = await ThemeModel.query.gino.all()
+            self.themes.fill([o.to_dc() for o in objs], version)
+        return self.themes.page(after_id, limit)
 
     async def create_question(
             self, title: str, theme_id: int, answers: List[Answer]
     ) -> Question:
-        obj = await QuestionModel.create(title=title, theme_id=theme_id)
-        question = obj.to_dc()
-        await self.create_answers(question.id, answers)
-        question.answers = answers
+        """Creates a question with its answers in one statement.
 
+        A duplicate title raises UniqueViolationError, an unknown theme
+        ForeignKeyViolationError, and nothing is written then.
+        """
+        row = await db.first(
+            CREATE_QUESTION,
+            title=title,
+            theme_id=theme_id,
+            titles=[a.title for a in answers],
+            correct=[a.is_correct for a in answers],
+        )
+        question = Question(
+            id=row["id"], title=title, theme_id=theme_id, answers=answers
+        )
+
+        version = row["version"]
+        if self.bank.version is not None and version == self.bank.version + 1:
+            self.bank.add(question)
+            self.bank.version = version
+        else:
+            # somebody else wrote in between, reload on the next refresh
+            self.bank.version = None
         return question
 
+    async def find_themes(self, ids: set[int], titles: set[str]) -> List[Theme]:
+        """Themes with any of the ids or titles, in one query."""
+        objs = await ThemeModel.query.where(
+            ThemeModel.id.in_(ids) | ThemeModel.title.in_(titles)
+        ).gino.all()
+        return [o.to_dc() for o in objs]
+
+    async def create_themes(self, titles: set[str]) -> int:
+        """Creates the themes that don't exist yet, returns how many."""
+        query = insert(ThemeModel.__table__).values([{"title": t} for t in titles])
+        query = query.on_conflict_do_nothing(index_elements=[ThemeModel.title])
+        async with db.transaction():
+            created = await db.all(query.returning(ThemeModel.id))
+            if created:
+                await self.bump_version(THEMES_VERSION)
+        return len(created)
+
+    async def existing_question_titles(self, titles: set[str]) -> set[str]:
+        rows = await select([QuestionModel.title]).where(
+            QuestionModel.title.in_(titles)
+        ).gino.all()
+        return {row[0] for row in rows}
+
+    async def existing_answer_titles(self, titles: set[str]) -> set[str]:
+        rows = await select([AnswerModel.title]).where(
+            AnswerModel.title.in_(titles)
+        ).gino.all()
+        return {row[0] for row in rows}
+
+    async def copy_questions(self, questions: List[Question]):
+        """Writes questions with their answers through COPY and sets their ids.
+
+        COPY can't return the ids, so they are taken from the sequence first.
+        Meant to run in a transaction, a failure leaves no question behind.
+        """
+        ids = await db.all(
+            db.text(
+                "SELECT nextval('questions_id_seq') FROM generate_series(1, :count)"
+            ),
+            count=len(questions),
+        )
+        for question, (id_,) in zip(questions, ids):
+            question.id = id_
+        async with db.acquire(reuse=True) as conn:
+            await conn.raw_connection.copy_records_to_table(
+                QuestionModel.__tablename__,
+                records=[(q.id, q.title, q.theme_id) for q in questions],
+                columns=["id", "title", "theme_id"],
+            )
+            await conn.raw_connection.copy_records_to_table(
+                AnswerModel.__tablename__,
+                records=[
+                    (a.title, a.is_correct, q.id) for q in questions for a in q.answers
+                ],
+                columns=["title", "is_correct", "question_id"],
+            )
+
     async def get_question_by_title(self, title: str) -> Optional[Question]:
         query = QuestionModel.outerjoin(
             AnswerModel,
@@ -67,21 +237,80 @@ class QuizAccessor(BaseAccessor):
 
         return questions[0].to_dc()
 
-    async def list_questions(self, theme_id: Optional[int] = None) -> List[Question]:
-        QuestionModel.outerjoin(
-            AnswerModel,
-            QuestionModel.id == AnswerModel.question_id,
-        ).select()
+    @staticmethod
+    def _filter_questions(query, theme_id: Optional[int], after_id: Optional[int]):
+        if theme_id is not None:
+            # served by questions_theme_id_idx, the join by answers_question_id_idx
+            query = query.where(QuestionModel.theme_id == theme_id)
+        if after_id is not None:
+            query = query.where(QuestionModel.id > after_id)
+        return query
 
+    async def list_questions(
+        self,
+        theme_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Question]:
+        """Questions ordered by id, the page after `after_id` if `limit` is set."""
         query = QuestionModel.outerjoin(
             AnswerModel,
             QuestionModel.id == AnswerModel.question_id,
         ).select()
+        if limit is None:
+            query = self._filter_questions(query, theme_id, after_id)
+        else:
+            # the limit counts questions, so it is applied before the join
+            ids = self._filter_questions(select([QuestionModel.id]), theme_id, after_id)
+            ids = ids.order_by(QuestionModel.id).limit(limit)
+            query = query.where(QuestionModel.id.in_(ids))
+        query = query.order_by(QuestionModel.id, AnswerModel.id)
 
-        query = await query.gino.load(
+        objs = await query.gino.load(
             QuestionModel.distinct(QuestionModel.id).load(add_answer=AnswerModel.load())
         ).all()
 
-        objs = query
-
         return [o.to_dc() for o in objs]
+
+    async def iter_questions(
+        self, theme_id: Optional[int] = None, after_id: Optional[int] = None
+    ) -> AsyncIterator[Question]:
+        """Questions ordered by id, read through a server-side cursor.
+
+        Only the question being built is kept in memory. The cursor needs a
+        transaction, so a connection is held until the iteration is done.
+        """
+        query = select(
+            [
+                QuestionModel.id,
+                QuestionModel.title,
+                QuestionModel.theme_id,
+                AnswerModel.title.label("answer_title"),
+                AnswerModel.is_correct,
+            ]
+        ).select_from(
+            QuestionModel.outerjoin(
+                AnswerModel, QuestionModel.id == AnswerModel.question_id
+            )
+        )
+        query = self._filter_questions(query, theme_id, after_id)
+        query = query.order_by(QuestionModel.id, AnswerModel.id)
+
+        async with db.transaction():
+            question = None
+            async for row in db.iterate(query):
+                if question is None or question.id != row["id"]:
+                    if question is not None:
+                        yield question
+                    question = Question(
+                        id=row["id"],
+                        title=row["title"],
+                        theme_id=row["theme_id"],
+                        answers=[],
+                    )
+                if row["answer_title"] is not None:
+                    question.answers.append(
+                        Answer(title=row["answer_title"], is_correct=row["is_correct"])
+                    )
+            if question is not None:
+                yield question
@@ -0,0 +1,57 @@
+from bisect import insort
+from typing import Iterable, Optional
+
+from app.quiz.models import Question
+from app.store.quiz.matcher import AnswerMatcher
+
+
+class QuestionBank:
+    """Process-local copy of every question with its answers.
+
+    Built once at startup and kept in step with admin writes, so the bot
+    serves questions and checks answers without touching the database.
+    `version` is the quiz_version the copy was built at, None if unknown.
+    Question ids are kept sorted, so an index into them points at the same
+    question after a reload.
+    """
+
+    def __init__(self, max_distance: int = 0):
+        self.max_distance = max_distance
+        self.version: Optional[int] = None
+        self.questions: dict[int, Question] = {}
+        self.ids: list[int] = []
+        self.by_theme: dict[int, list[int]] = {}
+        self.matchers: dict[int, AnswerMatcher] = {}
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def load(self, questions: Iterable[Question], version: Optional[int]):
+        self.questions = {}
+        self.matchers = {}
+        for question in questions:
+            self.questions[question.id] = question
+            self.matchers[question.id] = self._matcher(question)
+        self.ids = sorted(self.questions)
+        self.by_theme = {}
+        for id_ in self.ids:
+            theme_id = self.questions[id_].theme_id
+            self.by_theme.setdefault(theme_id, []).append(id_)
+        self.version = version
+
+    def add(self, question: Question):
+        if question.id not in self.questions:
+            # ids of new questions are the largest, so this is an append
+            insort(self.ids, question.id)
+            insort(self.by_theme.setdefault(question.theme_id, []), question.id)
+        self.questions[question.id] = question
+        self.matchers[question.id] = self._matcher(question)
+
+    def _matcher(self, question: Question) -> AnswerMatcher:
+        return AnswerMatcher(question.answers, max_distance=self.max_distance)
+
+    def question_ids(self, theme_id: Optional[int] = None) -> list[int]:
+        """Sorted ids of a theme or of every question, not to be modified."""
+        if theme_id is None:
+            return self.ids
+        return self.by_theme.get(theme_id, [])
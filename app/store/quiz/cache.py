@@ -0,0 +1,48 @@
+import hashlib
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+from app.quiz.models import Theme
+
+
+class ThemeCache:
+    """Process-local copy of the theme list.
+
+    `version` is the themes row of quiz_version the list was read at, a
+    list is only served while the row is still there: any process creating
+    a theme bumps it.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.themes: Optional[list[Theme]] = None
+        self.ids: list[int] = []
+
+    def is_current(self, version: int) -> bool:
+        return self.themes is not None and version == self.version
+
+    def fill(self, themes: Iterable[Theme], version: int):
+        """Caches themes read after `version` was read."""
+        self.version = version
+        self.themes = sorted(themes, key=lambda theme: theme.id)
+        self.ids = [theme.id for theme in self.themes]
+
+    def invalidate(self):
+        self.version = None
+        self.themes = None
+        self.ids = []
+
+    def page(
+        self, after_id: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[Theme]:
+        start = 0 if after_id is None else bisect_right(self.ids, after_id)
+        end = None if limit is None else start + limit
+        return self.themes[start:end]
+
+
+def etag(themes: Iterable[Theme]) -> str:
+    """A hash of the listed themes, equal lists get equal tags in any process."""
+    digest = hashlib.sha1()
+    for theme in themes:
+        digest.update(f"{theme.id}\0{theme.title}\0".encode())
+    return digest.hexdigest()
@@ -0,0 +1,62 @@
+import json
+import zlib
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator
+
+from app.quiz.models import ThemeModel
+from app.quiz.schemes import QuestionSchema, ThemeSchema
+from app.store.database.gino import db
+
+if TYPE_CHECKING:
+    from app.store.quiz.accessor import QuizAccessor
+    from app.web.app import Application
+
+CHUNK_SIZE = 1000
+
+
+async def export_rows(quizzes: "QuizAccessor") -> AsyncIterator[dict]:
+    """Every theme, then every question with its answers, read by cursor.
+
+    Rows carry a type, so /quiz.import_questions can recreate the themes
+    first and map the theme ids of the questions to the ones it created.
+    The read runs in one snapshot, an export is consistent.
+    """
+    async with db.transaction(isolation="repeatable_read", readonly=True):
+        themes = ThemeModel.query.order_by(ThemeModel.id)
+        async for theme in themes.gino.iterate():
+            yield {"type": "theme", **ThemeSchema().dump(theme.to_dc())}
+        async for question in quizzes.iter_questions():
+            yield {"type": "question", **QuestionSchema().dump(question)}
+
+
+async def gzip_ndjson(
+    rows: AsyncIterable[dict], chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Compresses rows as NDJSON, `chunk_size` lines at a time."""
+    # 16 + MAX_WBITS writes a gzip header and trailer around the stream
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            data = compressor.compress(("\n".join(lines) + "\n").encode())
+            lines = []
+            if data:
+                yield data
+    if lines:
+        yield compressor.compress(("\n".join(lines) + "\n").encode())
+    yield compressor.flush()
+
+
+async def write_archive(quizzes: "QuizAccessor", path: str):
+    with open(path, "wb") as f:
+        async for data in gzip_ndjson(export_rows(quizzes)):
+            f.write(data)
+
+
+async def export_to_file(app: "Application", path: str):
+    """Exports into a file without starting the application."""
+    await app.database.connect()
+    try:
+        await write_archive(app.store.quizzes, path)
+    finally:
+        await app.database.disconnect()
@@ -0,0 +1,224 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Union
+
+from marshmallow import ValidationError
+
+from app.quiz.models import Answer, Question
+from app.quiz.schemes import ImportQuestionSchema, ImportThemeSchema
+from app.store.database.gino import db
+
+if TYPE_CHECKING:
+    from app.store.quiz.accessor import QuizAccessor
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 100
+
+
+@dataclass
+class RowError:
+    # line of the upload, counted from 1
+    row: int
+    errors: dict
+
+
+@dataclass
+class ImportReport:
+    # themes created, and questions imported
+    themes: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+
+Row = tuple[int, Union[dict, RowError]]
+
+
+async def ndjson_rows(lines: AsyncIterable[bytes]) -> AsyncIterator[Row]:
+    """A JSON object per line, as /quiz.list_questions and /quiz.export write."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, RowError(number, {"_schema": ["Invalid JSON."]})
+
+
+async def csv_rows(lines: AsyncIterable[bytes]) -> AsyncIterator[Row]:
+    """Rows of a CSV with a header.
+
+    The columns are title, theme_id or theme, correct (the number of the
+    correct answer) and one column per answer named answer1, answer2...
+    Quoted values can't span lines, every line is a row.
+    """
+    number = 0
+    header = None
+    async for line in lines:
+        number += 1
+        text = line.decode("utf-8-sig" if number == 1 else "utf-8").strip()
+        if not text:
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        row = dict(zip(header, values))
+        answers = [
+            row.pop(column) for column in header if column.startswith("answer")
+        ]
+        correct = row.pop("correct", "")
+        if not correct.isdigit():
+            yield number, RowError(number, {"correct": ["Not a valid integer."]})
+            continue
+        row["answers"] = [
+            {"title": title, "is_correct": position == int(correct)}
+            for position, title in enumerate(answers, start=1)
+            if title
+        ]
+        yield number, row
+
+
+class QuestionImporter:
+    """Imports questions in one transaction, a chunk of rows at a time.
+
+    A chunk costs one query per kind of check, and the questions that pass
+    are written with COPY. Rows that fail are reported and skipped. Memory
+    is bounded by the chunk and the first `max_errors` errors: duplicates
+    of earlier chunks are found by the checks, which see the rows already
+    written in the transaction.
+
+    Rows of type theme, which come first in an export, create the missing
+    themes. The theme_id of a later question then means the id the theme
+    had in the exporting database.
+    """
+
+    def __init__(
+        self,
+        quizzes: "QuizAccessor",
+        chunk_size: int = CHUNK_SIZE,
+        max_errors: int = MAX_ERRORS,
+    ):
+        self.quizzes = quizzes
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.schema = ImportQuestionSchema()
+        self.theme_schema = ImportThemeSchema()
+        # exported theme ids to the ids of the same themes here
+        self.theme_ids: dict[int, int] = {}
+
+    async def run(self, rows: AsyncIterable[Row]) -> ImportReport:
+        report = ImportReport()
+        async with db.transaction():
+            themes, chunk = [], []
+            async for number, row in rows:
+                if isinstance(row, RowError):
+                    self.fail(report, row)
+                elif isinstance(row, dict) and row.get("type") == "theme":
+                    # rows are imported in order, a question may need a theme
+                    if chunk:
+                        await self.import_chunk(chunk, report)
+                        chunk = []
+                    themes.append((number, row))
+                    if len(themes) >= self.chunk_size:
+                        await self.import_themes(themes, report)
+                        themes = []
+                else:
+                    if themes:
+                        await self.import_themes(themes, report)
+                        themes = []
+                    chunk.append((number, row))
+                    if len(chunk) >= self.chunk_size:
+                        await self.import_chunk(chunk, report)
+                        chunk = []
+            if themes:
+                await self.import_themes(themes, report)
+            if chunk:
+                await self.import_chunk(chunk, report)
+            if report.imported:
+                await self.quizzes.bump_version()
+        if report.imported:
+            # too many to add one by one, the bank reloads on the next refresh
+            self.quizzes.bank.version = None
+        return report
+
+    def fail(self, report: ImportReport, error: RowError):
+        report.failed += 1
+        if len(report.errors) < self.max_errors:
+            report.errors.append(error)
+
+    async def import_themes(self, chunk: list[tuple[int, dict]], report: ImportReport):
+        valid = []
+        for number, row in chunk:
+            try:
+                valid.append(self.theme_schema.load(row))
+            except ValidationError as e:
+                self.fail(report, RowError(number, e.messages))
+        if not valid:
+            return
+        titles = {data["title"] for data in valid}
+        report.themes += await self.quizzes.create_themes(titles)
+        themes = await self.quizzes.find_themes(ids=set(), titles=titles)
+        ids = {theme.title: theme.id for theme in themes}
+        for data in valid:
+            if "id" in data:
+                self.theme_ids[data["id"]] = ids[data["title"]]
+
+    async def import_chunk(self, chunk: list[tuple[int, dict]], report: ImportReport):
+        valid = []
+        for number, row in chunk:
+            try:
+                data = self.schema.load(row)
+            except ValidationError as e:
+                self.fail(report, RowError(number, e.messages))
+                continue
+            theme_id = data.get("theme_id")
+            if theme_id in self.theme_ids:
+                data["theme_id"] = self.theme_ids[theme_id]
+            valid.append((number, data))
+
+        themes = await self.quizzes.find_themes(
+            ids={data["theme_id"] for _, data in valid if "theme_id" in data},
+            titles={data["theme"] for _, data in valid if "theme" in data},
+        )
+        theme_ids = {theme.id for theme in themes}
+        theme_by_title = {theme.title: theme.id for theme in themes}
+        taken_titles = await self.quizzes.existing_question_titles(
+            {data["title"] for _, data in valid}
+        )
+        taken_answers = await self.quizzes.existing_answer_titles(
+            {answer["title"] for _, data in valid for answer in data["answers"]}
+        )
+
+        questions = []
+        for number, data in valid:
+            theme_id = data.get("theme_id", theme_by_title.get(data.get("theme")))
+            titles = [answer["title"] for answer in data["answers"]]
+            if theme_id not in theme_ids:
+                self.fail(report, RowError(number, {"theme": ["Theme not found."]}))
+            elif data["title"] in taken_titles:
+                self.fail(
+                    report, RowError(number, {"title": ["Question already exists."]})
+                )
+            elif len(set(titles)) != len(titles) or taken_answers.intersection(titles):
+                self.fail(
+                    report, RowError(number, {"answers": ["Answer already exists."]})
+                )
+            else:
+                # later rows of the chunk can't reuse the titles either
+                taken_titles.add(data["title"])
+                taken_answers.update(titles)
+                questions.append(
+                    Question(
+                        id=None,
+                        title=data["title"],
+                        theme_id=theme_id,
+                        answers=[Answer(**answer) for answer in data["answers"]],
+                    )
+                )
+        if questions:
+            await self.quizzes.copy_questions(questions)
+            report.imported += len(questions)
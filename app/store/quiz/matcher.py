@@ -0,0 +1,92 @@
+import string
+from typing import Optional
+
+from app.quiz.models import Answer
+
+_TRANSLATION = str.maketrans(
+    {**{c: " " for c in string.punctuation + "«»—–…№"}, "ё": "е"}
+)
+# prefixes shorter than this would match too many unrelated replies
+MIN_PREFIX = 3
+# titles shorter than this are matched exactly, "да" must not pass for "до"
+MIN_FUZZY_LENGTH = 5
+
+
+def normalize(text: str) -> str:
+    """Lower case, ё as е, punctuation as spaces and single spaces."""
+    return " ".join(text.lower().translate(_TRANSLATION).split())
+
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance of a and b is at most `limit`.
+
+    Only a band of 2 * limit + 1 cells around the diagonal is computed and
+    the scan stops as soon as a row has no cell within the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    far = limit + 1
+    previous = [j if j <= limit else far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [far] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+        if min(current[low - 1 : high + 1]) > limit:
+            return False
+        previous = current
+    return previous[len(b)] <= limit
+
+
+class AnswerMatcher:
+    """Resolves a free-text reply to one of the answers of a question.
+
+    Titles, unique title prefixes and answer numbers go into one dict, so
+    a reply costs a normalization plus a lookup. Only if that misses are
+    the few answers compared by edit distance.
+    """
+
+    __slots__ = ("index", "titles", "correct", "max_distance")
+
+    def __init__(self, answers: list[Answer], max_distance: int = 0):
+        self.titles = [normalize(answer.title) for answer in answers]
+        self.correct = frozenset(
+            i for i, answer in enumerate(answers) if answer.is_correct
+        )
+        self.max_distance = max_distance
+        self.index: dict[str, int] = {}
+        prefixes: dict[str, Optional[int]] = {}
+        for i, title in enumerate(self.titles):
+            for length in range(MIN_PREFIX, len(title)):
+                prefix = title[:length]
+                # a prefix shared by two answers identifies neither
+                prefixes[prefix] = None if prefix in prefixes else i
+        self.index.update(
+            (prefix, i) for prefix, i in prefixes.items() if i is not None
+        )
+        self.index.update((str(i), i - 1) for i in range(1, len(answers) + 1))
+        # full titles win over a prefix of another answer
+        self.index.update((title, i) for i, title in enumerate(self.titles))
+
+    def match(self, reply: str) -> Optional[int]:
+        """Index of the answer the reply means, None if it is unclear."""
+        reply = normalize(reply)
+        i = self.index.get(reply)
+        if i is not None or not self.max_distance:
+            return i
+        close = [
+            i
+            for i, title in enumerate(self.titles)
+            if len(title) >= MIN_FUZZY_LENGTH
+            and within_distance(reply, title, self.max_distance)
+        ]
+        return close[0] if len(close) == 1 else None
+
+    def is_correct(self, reply: str) -> bool:
+        return self.match(reply) in self.correct
@@ -0,0 +1,54 @@
+import random
+from dataclasses import dataclass
+from math import gcd
+from typing import Optional
+
+from app.store.quiz.bank import QuestionBank
+
+
+@dataclass(frozen=True)
+class Deck:
+    """A random order of the first `size` questions of a theme.
+
+    Position i maps to index (step * i + offset) % size of the sorted ids.
+    With step coprime to size that is a permutation, so a game never asks
+    a question twice while it only stores three numbers and a position.
+    """
+
+    size: int
+    step: int
+    offset: int
+
+    def index(self, position: int) -> int:
+        return (self.step * position + self.offset) % self.size
+
+
+class QuestionSelector:
+    """Picks questions for games from the question bank in constant time."""
+
+    def __init__(self, bank: QuestionBank):
+        self.bank = bank
+
+    def deck(
+        self, theme_id: Optional[int] = None, rng: random.Random = random
+    ) -> Optional[Deck]:
+        """A new deck over the questions of a theme, None if there are none."""
+        size = len(self.bank.question_ids(theme_id))
+        if not size:
+            return None
+        step = 1
+        if size > 1:
+            # a random number is coprime to size often enough to just retry
+            step = rng.randrange(1, size)
+            while gcd(step, size) != 1:
+                step = rng.randrange(1, size)
+        return Deck(size=size, step=step, offset=rng.randrange(size))
+
+    def pick(
+        self, deck: Deck, position: int, theme_id: Optional[int] = None
+    ) -> Optional[int]:
+        """Id of the question at a position of a deck."""
+        ids = self.bank.question_ids(theme_id)
+        index = deck.index(position)
+        # the bank only grows, unless the questions were deleted meanwhile
+        return ids[index] if index < len(ids) else None
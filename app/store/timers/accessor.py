@@ -0,0 +1,56 @@
+import asyncio
+import typing
+from asyncio import Task
+from typing import Hashable, Optional
+
+from app.base.base_accessor import BaseAccessor
+from app.store.timers.wheel import TimerWheel, to_ticks
+
+if typing.TYPE_CHECKING:
+    from app.web.app import Application
+
+
+class TimerAccessor(BaseAccessor):
+    """Deadlines of the whole process on a single timer wheel.
+
+    One task advances the wheel every tick and hands everything that
+    expired to BotManager in one call, instead of one sleeping task per
+    deadline.
+    """
+
+    def __init__(self, app: "Application", *args, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        self.tick = app.config.bot.timer_tick
+        self.wheel = TimerWheel()
+        self.task: Optional[Task] = None
+
+    async def connect(self, app: "Application"):
+        # the ingest process has no games, so no deadlines either
+        if app.config.bot.mode != "ingest":
+            self.task = asyncio.create_task(self.run())
+
+    async def disconnect(self, app: "Application"):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def schedule(self, key: Hashable, delay: float):
+        self.wheel.schedule(key, to_ticks(delay, self.tick))
+
+    def cancel(self, key: Hashable) -> bool:
+        return self.wheel.cancel(key)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time() - self.wheel.now * self.tick
+        while True:
+            await asyncio.sleep(self.tick)
+            # catch up on the ticks a busy loop delayed instead of drifting
+            ticks = int((loop.time() - started) / self.tick) - self.wheel.now
+            expired = self.wheel.advance(ticks)
+            if not expired:
+                continue
+            try:
+                await self.app.store.bots_manager.handle_timeouts(expired)
+            except Exception as e:
+                self.logger.error("Exception", exc_info=e)
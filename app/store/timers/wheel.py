@@ -0,0 +1,85 @@
+import math
+from typing import Hashable
+
+
+class TimerWheel:
+    """Hierarchical timing wheel counting time in ticks.
+
+    Level L has `slots` buckets of slots**L ticks each. A timer sits in the
+    lowest level whose range covers it and moves down a level when the
+    wheel reaches its bucket, so scheduling, cancelling and a tick without
+    expirations are O(1). A bucket is a dict, and a timer costs two dict
+    entries no matter how far away its deadline is.
+    """
+
+    def __init__(self, slots: int = 64, levels: int = 4):
+        self.slots = slots
+        self.levels = levels
+        self.wheels: list[list[dict[Hashable, int]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        # key -> (level, slot) of the bucket the timer is in
+        self.timers: dict[Hashable, tuple[int, int]] = {}
+        self.now = 0
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.timers
+
+    def schedule(self, key: Hashable, ticks: int):
+        """(Re)schedules `key` to expire `ticks` ticks from now."""
+        self.cancel(key)
+        self._place(key, self.now + max(1, ticks))
+
+    def cancel(self, key: Hashable) -> bool:
+        position = self.timers.pop(key, None)
+        if position is None:
+            return False
+        level, slot = position
+        del self.wheels[level][slot][key]
+        return True
+
+    def _place(self, key: Hashable, deadline: int):
+        remaining = deadline - self.now
+        span = 1
+        for level in range(self.levels):
+            if remaining < span * self.slots or level == self.levels - 1:
+                slot = deadline // span % self.slots
+                self.wheels[level][slot][key] = deadline
+                self.timers[key] = (level, slot)
+                return
+            span *= self.slots
+
+    def advance(self, ticks: int = 1) -> list[Hashable]:
+        """Moves the wheel `ticks` ticks forward and returns expired keys."""
+        expired = []
+        for _ in range(ticks):
+            self.now += 1
+            # cascade the buckets the wheel just reached, top level first
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self.now % span:
+                    continue
+                bucket = self.wheels[level][self.now // span % self.slots]
+                if not bucket:
+                    continue
+                self.wheels[level][self.now // span % self.slots] = {}
+                for key, deadline in bucket.items():
+                    if deadline <= self.now:
+                        del self.timers[key]
+                        expired.append(key)
+                    else:
+                        self._place(key, deadline)
+            bucket = self.wheels[0][self.now % self.slots]
+            if bucket:
+                self.wheels[0][self.now % self.slots] = {}
+                for key in bucket:
+                    del self.timers[key]
+                expired.extend(bucket)
+        return expired
+
+
+def to_ticks(delay: float, tick: float) -> int:
+    return math.ceil(delay / tick)
@@ -1,115 +1,117 @@
-import random
 import typing
 from typing import Optional
 
-from aiohttp import TCPConnector
 from aiohttp.client import ClientSession
 
 from app.base.base_accessor import BaseAccessor
-from app.store.vk_api.dataclasses import Update, Message, UpdateObject
-from app.store.vk_api.poller import Poller
+from app.store.bot.pipeline import Dedup, Pipeline, default_stages
+from app.store.bot.worklog import WorkLog
+from app.store.vk_api.checkpoint import (
+    Checkpointer,
+    CheckpointStore,
+    DatabaseCheckpointStore,
+    FileCheckpointStore,
+)
+from app.store.vk_api.dataclasses import Message
+from app.store.vk_api.group import GroupClient
+from app.store.vk_api.http import PoolStats, make_session
 
 if typing.TYPE_CHECKING:
     from app.web.app import Application
 
-API_PATH = "https://api.vk.com/method/"
-
 
 class VkApiAccessor(BaseAccessor):
     def __init__(self, app: "Application", *args, **kwargs):
         super().__init__(app, *args, **kwargs)
         self.session: Optional[ClientSession] = None
-        self.key: Optional[str] = None
-        self.server: Optional[str] = None
-        self.poller: Optional[Poller] = None
-        self.ts: Optional[int] = None
+        self.poll_session: Optional[ClientSession] = None
+        self.api_stats: Optional[PoolStats] = None
+        self.poll_stats: Optional[PoolStats] = None
+        self.checkpoints: Optional[CheckpointStore] = None
+        self.groups: dict[int, GroupClient] = {}
+        self.worklog: Optional[WorkLog] = None
+        self.worker: Optional[Pipeline] = None
+        self.worker_checkpointer: Optional[Checkpointer] = None
 
     async def connect(self, app: "Application"):
-        self.session = ClientSession(connector=TCPConnector(verify_ssl=False))
-        try:
-            await self._get_long_poll_service()
-        except Exception as e:
-            self.logger.error("Exception", exc_info=e)
-        self.poller = Poller(app.store)
-        self.logger.info("start polling")
-        await self.poller.start()
+        self.open()
+        if app.config.bot.mode == "worker":
+            # workers only send replies, the ingest process owns the long poll
+            await self.start_worker()
+            return
+        for group in self.groups.values():
+            await group.start()
 
     async def disconnect(self, app: "Application"):
+        if self.worker:
+            await self.worker.stop()
+            await self.worker_checkpointer.stop()
+        for group in self.groups.values():
+            await group.stop()
         if self.session:
             await self.session.close()
-        if self.poller:
-            await self.poller.stop()
+        if self.poll_session:
+            await self.poll_session.close()
 
-    @staticmethod
-    def _build_query(host: str, method: str, params: dict) -> str:
-        url = host + method + "?"
-        if "v" not in params:
-            params["v"] = "5.131"
-        url += "&".join([f"{k}={v}" for k, v in params.items()])
-        return url
+    def open(self):
+        """Creates the shared HTTP pools and a client for every group."""
+        config = self.app.config.bot
+        # the long poll holds its connection for up to `wait` seconds, so it
+        # gets its own pool and can never starve messages.send
+        self.api_stats = PoolStats(limit_per_host=config.api_limit_per_host)
+        self.session = make_session(
+            self.api_stats,
+            limit=config.api_limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            dns_cache_ttl=config.dns_cache_ttl,
+            timeout=config.api_timeout,
+        )
+        poll_limit = config.poll_limit_per_host * len(config.groups)
+        self.poll_stats = PoolStats(limit_per_host=poll_limit)
+        self.poll_session = make_session(
+            self.poll_stats,
+            limit=poll_limit,
+            keepalive_timeout=config.keepalive_timeout,
+            dns_cache_ttl=config.dns_cache_ttl,
+            timeout=config.poll_timeout,
+        )
+        if config.checkpoint == "file":
+            self.checkpoints = FileCheckpointStore(config.checkpoint_path)
+        else:
+            self.checkpoints = DatabaseCheckpointStore()
+        self.groups = {
+            group.group_id: GroupClient(self, group) for group in config.groups
+        }
+        self.worklog = WorkLog(
+            partitions=config.partitions,
+            worker_partitions=config.worker_partitions,
+            batch_size=config.worklog_batch_size,
+            poll_interval=config.worklog_poll_interval,
+            lease=config.worklog_lease,
+        )
 
-    async def _get_long_poll_service(self):
-        async with self.session.get(
-            self._build_query(
-                host=API_PATH,
-                method="groups.getLongPollServer",
-                params={
-                    "group_id": self.app.config.bot.group_id,
-                    "access_token": self.app.config.bot.token,
-                },
-            )
-        ) as resp:
-            data = (await resp.json())["response"]
-            self.logger.info(data)
-            self.key = data["key"]
-            self.server = data["server"]
-            self.ts = data["ts"]
-            self.logger.info(self.server)
+    async def start_worker(self):
+        config = self.app.config.bot
+        self.worker_checkpointer = Checkpointer(
+            self.worklog, group_id=0, interval=config.checkpoint_interval
+        )
+        self.worker = Pipeline(
+            self.worklog.poll,
+            self.app.store.bots_manager.handle_update,
+            stages=default_stages(config),
+            workers=config.workers,
+            queue_size=config.queue_size,
+            on_processed=self.worker_checkpointer.commit,
+            dedup=Dedup(config.dedup_ttl),
+        )
+        self.logger.info("start worker on partitions %s", config.worker_partitions)
+        await self.worker_checkpointer.start()
+        await self.worker.start()
 
-    async def poll(self):
-        async with self.session.get(
-            self._build_query(
-                host=self.server,
-                method="",
-                params={
-                    "act": "a_check",
-                    "key": self.key,
-                    "ts": self.ts,
-                    "wait": 30,
-                },
-            )
-        ) as resp:
-            data = await resp.json()
-            self.logger.info(data)
-            self.ts = data["ts"]
-            raw_updates = data.get("updates", [])
-            updates = []
-            for update in raw_updates:
-                updates.append(
-                    Update(
-                        type=update["type"],
-                        object=UpdateObject(
-                            id=update["object"]["id"],
-                            user_id=update["object"]["user_id"],
-                            body=update["object"]["body"],
-                        ),
-                    )
-                )
-            await self.app.store.bots_manager.handle_updates(updates)
+    def group(self, group_id: Optional[int] = None) -> GroupClient:
+        if group_id is None:
+            return next(iter(self.groups.values()))
+        return self.groups[group_id]
 
     async def send_message(self, message: Message) -> None:
-        async with self.session.get(
-            self._build_query(
-                API_PATH,
-                "messages.send",
-                params={
-                    "user_id": message.user_id,
-                    "random_id": random.randint(1, 2 ** 32),
-                    "peer_id": "-" + str(self.app.config.bot.group_id),
-                    "message": message.text,
-                    "access_token": self.app.config.bot.token,
-                },
-            )
-        ) as resp:
-            data = await resp.json()
-            self.logger.info(data)
+        await self.group(message.group_id).send_message(message)
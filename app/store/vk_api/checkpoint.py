@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from asyncio import Task
+from logging import getLogger
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.bot.models import LongPollCheckpointModel
+from app.store.database.gino import db
+
+
+class CheckpointStore(ABC):
+    @abstractmethod
+    async def load(self, group_id: int) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    async def save(self, group_id: int, ts: int):
+        ...
+
+
+class DatabaseCheckpointStore(CheckpointStore):
+    async def load(self, group_id: int) -> Optional[int]:
+        obj = await LongPollCheckpointModel.get(group_id)
+        return None if obj is None else obj.ts
+
+    async def save(self, group_id: int, ts: int):
+        query = insert(LongPollCheckpointModel.__table__).values(
+            group_id=group_id, ts=int(ts)
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[LongPollCheckpointModel.group_id],
+            set_={"ts": query.excluded.ts},
+        )
+        await db.status(query)
+
+
+class FileCheckpointStore(CheckpointStore):
+    def __init__(self, path: str):
+        self.path = path
+
+    async def load(self, group_id: int) -> Optional[int]:
+        return self._read().get(str(group_id))
+
+    async def save(self, group_id: int, ts: int):
+        data = self._read()
+        data[str(group_id)] = int(ts)
+        await asyncio.get_event_loop().run_in_executor(None, self._write, data)
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write(self, data: dict):
+        # write-then-rename, so a crash never leaves a half written file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class Checkpointer:
+    """Saves the last fully processed ts every `interval` seconds."""
+
+    def __init__(self, store: CheckpointStore, group_id: int, interval: float):
+        self.store = store
+        self.group_id = group_id
+        self.interval = interval
+        self.ts: Optional[int] = None
+        self.saved_ts: Optional[int] = None
+        self.task: Optional[Task] = None
+        self.logger = getLogger("checkpoint")
+
+    def commit(self, ts: int):
+        self.ts = ts
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error("Exception", exc_info=e)
+
+    async def flush(self):
+        if self.ts is None or self.ts == self.saved_ts:
+            return
+        ts = self.ts
+        await self.store.save(self.group_id, ts)
+        self.saved_ts = ts
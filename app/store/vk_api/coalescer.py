@@ -0,0 +1,63 @@
+import asyncio
+from asyncio import Future, Task, TimerHandle
+from typing import Any, Awaitable, Callable, Optional
+
+
+class SendCoalescer:
+    """Collects single API calls and flushes them as one batch.
+
+    A batch is flushed when `max_batch` calls are pending or `max_delay`
+    seconds after the first call of the batch, whichever comes first.
+    Every caller gets back the result of its own call.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[dict]], Awaitable[list[Any]]],
+        max_batch: int = 25,
+        max_delay: float = 0.005,
+    ):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending: list[tuple[dict, Future]] = []
+        self.timer: Optional[TimerHandle] = None
+        self.flush_tasks: set[Task] = set()
+
+    async def send(self, params: dict) -> Any:
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append((params, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush_pending()
+        elif self.timer is None:
+            self.timer = asyncio.get_event_loop().call_later(
+                self.max_delay, self.flush_pending
+            )
+        return await future
+
+    def flush_pending(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        task = asyncio.create_task(self._flush(batch))
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def _flush(self, batch: list[tuple[dict, Future]]):
+        try:
+            results = await self.flush([params for params, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        self.flush_pending()
+        await asyncio.gather(*self.flush_tasks, return_exceptions=True)
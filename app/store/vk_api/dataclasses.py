@@ -1,20 +1,86 @@
 from dataclasses import dataclass
+from enum import IntEnum
+from typing import NamedTuple, Optional
 
 
-@dataclass
-class UpdateObject:
+class Priority(IntEnum):
+    """Lower value goes out first when the request rate is limited."""
+
+    REPLY = 0
+    BROADCAST = 1
+
+
+MESSAGE_NEW = "message_new"
+
+
+class UpdateObject(NamedTuple):
+    """A message_new object.
+
+    Tuples are immutable and cost no per-instance dict. Fields the bot does
+    not model are read from `raw`, which is the decoded object itself.
+    """
+
     id: int
     user_id: int
     body: str
+    peer_id: Optional[int] = None
+    # keyboard button payload, a JSON string set by the button
+    payload: Optional[str] = None
+    raw: Optional[dict] = None
+    # number of the message in its conversation, id is 0 in group chats
+    conversation_message_id: Optional[int] = None
 
+    @property
+    def chat_id(self) -> int:
+        """The peer of a dialog is the user, every member of a chat shares it."""
+        return self.peer_id or self.user_id
 
-@dataclass
-class Update:
+    @classmethod
+    def from_raw(cls, raw: dict) -> "UpdateObject":
+        # since API 5.103 the message is nested and client_info sits next to it
+        message = raw.get("message", raw)
+        user_id = message.get("from_id", message.get("user_id"))
+        if user_id is None:
+            # updates are routed by their chat, which needs the sender
+            raise ValueError(f"message without a sender: {message!r}")
+        return cls(
+            id=message["id"],
+            user_id=user_id,
+            body=message.get("text", message.get("body", "")),
+            peer_id=message.get("peer_id"),
+            payload=message.get("payload"),
+            raw=raw,
+            conversation_message_id=message.get("conversation_message_id"),
+        )
+
+
+class Update(NamedTuple):
     type: str
     object: UpdateObject
+    group_id: Optional[int] = None
+
+
+@dataclass
+class UpdateBatch:
+    ts: int
+    updates: list[Update]
+
+
+@dataclass
+class LongPollStats:
+    ts_outdated: int = 0
+    key_expired: int = 0
+    info_lost: int = 0
+    reconnects: int = 0
+    errors: int = 0
 
 
 @dataclass
 class Message:
     user_id: int
     text: str
+    priority: Priority = Priority.REPLY
+    # community to answer from, the first configured one if not set
+    group_id: Optional[int] = None
+    # conversation to answer in, e.g. a group chat; the user's dialog if not set
+    peer_id: Optional[int] = None
@@ -0,0 +1,23 @@
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Decoder = Callable[[bytes], Any]
+
+
+def get_decoder(name: str = "auto") -> Decoder:
+    """Returns the function long-poll bodies are decoded with.
+
+    "auto" picks orjson when it is installed and falls back to the stdlib.
+    """
+    if name == "json" or (name == "auto" and orjson is None):
+        return json.loads
+    if name in ("auto", "orjson"):
+        if orjson is None:
+            raise ValueError("orjson is not installed")
+        return orjson.loads
+    raise ValueError(f"unknown json decoder {name!r}")
@@ -0,0 +1,300 @@
+import asyncio
+import itertools
+import json
+import random
+import typing
+from functools import partial
+from logging import getLogger
+from typing import Optional
+
+from aiohttp import ClientError
+
+from app.store.bot.pipeline import Dedup, Pipeline, default_stages
+from app.store.bot.worklog import Ingester
+from app.store.vk_api.checkpoint import Checkpointer
+from app.store.vk_api.coalescer import SendCoalescer
+from app.store.vk_api.dataclasses import (
+    MESSAGE_NEW,
+    Update,
+    Message,
+    UpdateObject,
+    UpdateBatch,
+    Priority,
+    LongPollStats,
+)
+from app.store.vk_api.decoder import get_decoder
+from app.store.vk_api.scheduler import RateLimiter
+
+if typing.TYPE_CHECKING:
+    from app.store.vk_api.accessor import VkApiAccessor
+    from app.web.config import GroupConfig
+
+API_PATH = "https://api.vk.com/method/"
+API_VERSION = "5.131"
+# VK runs at most 25 API calls inside a single execute
+EXECUTE_LIMIT = 25
+TOO_MANY_REQUESTS = 6
+# long-poll "failed" codes
+TS_OUTDATED = 1
+KEY_EXPIRED = 2
+INFO_LOST = 3
+
+
+class VkApiError(Exception):
+    pass
+
+
+class GroupClient:
+    """Long poll and API calls of a single community.
+
+    HTTP pools and the checkpoint store are shared through the accessor,
+    while the key, ts, rate limit and send lanes belong to the group token.
+    """
+
+    def __init__(self, accessor: "VkApiAccessor", group: "GroupConfig"):
+        self.accessor = accessor
+        self.config = accessor.app.config.bot
+        self.group_id = group.group_id
+        self.token = group.token
+        self.logger = getLogger("accessor")
+        self.key: Optional[str] = None
+        self.server: Optional[str] = None
+        self.ts: Optional[int] = None
+        self.long_poll_stats = LongPollStats()
+        self.poll_errors = 0
+        self.decode = get_decoder(self.config.json_decoder)
+        self.poller: Optional[typing.Union[Pipeline, Ingester]] = None
+        self.limiter = RateLimiter(
+            rate=self.config.rate_limit, burst=self.config.rate_burst
+        )
+        # one lane per priority, so a batch never mixes replies and broadcasts
+        self.coalescers = {
+            priority: SendCoalescer(
+                partial(self._send_messages, priority=priority),
+                max_batch=min(self.config.send_batch_size, EXECUTE_LIMIT),
+                max_delay=self.config.send_batch_delay,
+            )
+            for priority in Priority
+        }
+        self.checkpointer = Checkpointer(
+            accessor.checkpoints,
+            group_id=self.group_id,
+            interval=self.config.checkpoint_interval,
+        )
+
+    async def start(self):
+        try:
+            self.ts = await self.checkpointer.store.load(self.group_id)
+        except Exception as e:
+            self.logger.error("Exception", exc_info=e)
+        try:
+            # resume from the restored ts instead of skipping to a fresh one
+            await self._get_long_poll_service(update_ts=self.ts is None)
+        except Exception as e:
+            self.logger.error("Exception", exc_info=e)
+        if self.config.mode == "ingest":
+            self.poller = Ingester(
+                self.poll,
+                self.accessor.worklog,
+                on_processed=self.checkpointer.commit,
+            )
+        else:
+            self.poller = Pipeline(
+                self.poll,
+                self.accessor.app.store.bots_manager.handle_update,
+                stages=default_stages(self.config),
+                workers=self.config.workers,
+                queue_size=self.config.queue_size,
+                on_processed=self.checkpointer.commit,
+                dedup=Dedup(self.config.dedup_ttl),
+            )
+        self.logger.info("start polling group %s", self.group_id)
+        await self.checkpointer.start()
+        await self.poller.start()
+
+    async def stop(self):
+        # stop the poller first so queued updates can still be answered
+        if self.poller:
+            await self.poller.stop()
+        await self.checkpointer.stop()
+        for coalescer in self.coalescers.values():
+            await coalescer.close()
+
+    @staticmethod
+    def _build_query(host: str, method: str, params: dict) -> str:
+        url = host + method + "?"
+        if "v" not in params:
+            params["v"] = API_VERSION
+        url += "&".join([f"{k}={v}" for k, v in params.items()])
+        return url
+
+    async def _get_long_poll_service(self, update_ts: bool = True):
+        data = await self._call(
+            "groups.getLongPollServer",
+            {"group_id": self.group_id},
+        )
+        if "response" not in data:
+            raise VkApiError(data.get("error"))
+        data = data["response"]
+        self.logger.info(data["server"])
+        self.key = data["key"]
+        self.server = data["server"]
+        if update_ts or self.ts is None:
+            self.ts = data["ts"]
+
+    async def _reconnect(self, update_ts: bool):
+        self.long_poll_stats.reconnects += 1
+        for attempt in itertools.count():
+            try:
+                await self._get_long_poll_service(update_ts)
+                return
+            except Exception as e:
+                self.long_poll_stats.errors += 1
+                self.logger.error("Exception", exc_info=e)
+            await self._backoff(attempt)
+
+    async def _backoff(self, attempt: int):
+        delay = min(
+            self.config.reconnect_max_delay, self.config.reconnect_delay * 2 ** attempt
+        )
+        # full jitter keeps a fleet of bots from reconnecting in lockstep
+        await asyncio.sleep(random.uniform(0, delay))
+
+    async def _poll_failed(self, error: Exception):
+        self.long_poll_stats.errors += 1
+        self.logger.error("Exception", exc_info=error)
+        await self._backoff(self.poll_errors)
+        self.poll_errors += 1
+
+    async def poll(self) -> UpdateBatch:
+        if self.server is None:
+            await self._reconnect(update_ts=self.ts is None)
+        try:
+            async with self.accessor.poll_session.get(
+                self._build_query(
+                    host=self.server,
+                    method="",
+                    params={
+                        "act": "a_check",
+                        "key": self.key,
+                        "ts": self.ts,
+                        "wait": 30,
+                    },
+                )
+            ) as resp:
+                data = self.decode(await resp.read())
+            if not isinstance(data, dict):
+                raise ValueError(f"unexpected long poll response {data!r}")
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            # a body that is not JSON, e.g. a 502 page, is a network error too
+            await self._poll_failed(e)
+            return UpdateBatch(ts=self.ts, updates=[])
+
+        # formatting a big batch is costly, so it only happens at DEBUG
+        self.logger.debug("long poll response: %s", data)
+        failed = data.get("failed")
+        if failed in (None, TS_OUTDATED, KEY_EXPIRED, INFO_LOST):
+            self.poll_errors = 0
+        if failed == TS_OUTDATED:
+            # events were lost, continue from the ts the server suggests
+            self.long_poll_stats.ts_outdated += 1
+            self.ts = data["ts"]
+        elif failed == KEY_EXPIRED:
+            self.long_poll_stats.key_expired += 1
+            await self._reconnect(update_ts=False)
+        elif failed == INFO_LOST:
+            self.long_poll_stats.info_lost += 1
+            await self._reconnect(update_ts=True)
+        elif failed:
+            # an unknown code may repeat on every request: back off, and get
+            # a new key in case it is the key the server rejects
+            await self._poll_failed(VkApiError(f"long poll failed with {failed}"))
+            await self._reconnect(update_ts=False)
+        if failed:
+            return UpdateBatch(ts=self.ts, updates=[])
+
+        self.ts = data["ts"]
+        # other events, e.g. message_reply for our own answers, are not handled
+        updates = []
+        for update in data.get("updates", []):
+            if update.get("type") != MESSAGE_NEW:
+                continue
+            try:
+                obj = UpdateObject.from_raw(update["object"])
+            except (KeyError, ValueError) as e:
+                # skipped alone, the rest of the batch is still handled
+                self.logger.error("Exception", exc_info=e)
+                continue
+            updates.append(Update(type=MESSAGE_NEW, object=obj, group_id=self.group_id))
+        return UpdateBatch(ts=self.ts, updates=updates)
+
+    async def send_message(self, message: Message) -> None:
+        result = await self.coalescers[message.priority].send(
+            {
+                "user_id": message.user_id,
+                "random_id": random.randint(1, 2 ** 32),
+                "peer_id": message.peer_id or "-" + str(self.group_id),
+                "message": message.text,
+            }
+        )
+        if result is False:
+            self.logger.error("message to %s was not sent", message.user_id)
+
+    async def _call(
+        self, method: str, params: dict, priority: Priority = Priority.REPLY
+    ) -> dict:
+        params = {
+            **params,
+            "access_token": self.token,
+            "v": API_VERSION,
+        }
+        for _ in range(self.config.max_retries + 1):
+            await self.limiter.acquire(priority)
+            async with self.accessor.session.post(
+                API_PATH + method, data=params
+            ) as resp:
+                data = await resp.json()
+            error = data.get("error")
+            if error is None:
+                self.limiter.succeeded()
+                return data
+            if error.get("error_code") != TOO_MANY_REQUESTS:
+                break
+            self.limiter.throttled()
+        self.logger.error(data["error"])
+        return data
+
+    async def _send_messages(
+        self, calls: list[dict], priority: Priority = Priority.REPLY, attempt: int = 0
+    ) -> list:
+        if len(calls) == 1:
+            data = await self._call("messages.send", calls[0], priority)
+            return [data.get("response", False)]
+
+        # up to 25 messages.send calls cost a single request through execute
+        code = "return [%s];" % ",".join(
+            "API.messages.send(%s)" % json.dumps(params, ensure_ascii=False)
+            for params in calls
+        )
+        data = await self._call("execute", {"code": code}, priority)
+        results = data.get("response") or [False] * len(calls)
+
+        # execute_errors lists the errors of the failed calls in call order
+        errors = iter(data.get("execute_errors", []))
+        retry = []
+        for i, result in enumerate(results):
+            if result is not False:
+                continue
+            error = next(errors, {})
+            if error.get("error_code") == TOO_MANY_REQUESTS:
+                retry.append(i)
+            elif error:
+                self.logger.error(error)
+        if retry and attempt < self.config.max_retries:
+            self.limiter.throttled()
+            retried = await self._send_messages(
+                [calls[i] for i in retry], priority, attempt + 1
+            )
+            for i, result in zip(retry, retried):
+                results[i] = result
+        return results
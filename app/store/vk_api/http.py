@@ -0,0 +1,70 @@
+import time
+from dataclasses import dataclass
+
+from aiohttp import ClientTimeout, TCPConnector, TraceConfig
+from aiohttp.client import ClientSession
+
+
+@dataclass
+class PoolStats:
+    limit_per_host: int
+    requests: int = 0
+    in_flight: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    # requests that had to wait for a free connection: the pool is saturated
+    queued: int = 0
+    queued_time: float = 0.0
+
+
+def _trace_config(stats: PoolStats) -> TraceConfig:
+    async def on_request_start(session, ctx, params):
+        stats.requests += 1
+        stats.in_flight += 1
+
+    async def on_request_done(session, ctx, params):
+        stats.in_flight -= 1
+
+    async def on_connection_create_end(session, ctx, params):
+        stats.connections_created += 1
+
+    async def on_connection_reuseconn(session, ctx, params):
+        stats.connections_reused += 1
+
+    async def on_connection_queued_start(session, ctx, params):
+        stats.queued += 1
+        ctx.queued_at = time.monotonic()
+
+    async def on_connection_queued_end(session, ctx, params):
+        stats.queued_time += time.monotonic() - ctx.queued_at
+
+    trace_config = TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_done)
+    trace_config.on_request_exception.append(on_request_done)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    return trace_config
+
+
+def make_session(
+    stats: PoolStats,
+    limit: int,
+    keepalive_timeout: float,
+    dns_cache_ttl: int,
+    timeout: float,
+) -> ClientSession:
+    connector = TCPConnector(
+        ssl=False,
+        limit=limit,
+        limit_per_host=stats.limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=dns_cache_ttl,
+    )
+    return ClientSession(
+        connector=connector,
+        timeout=ClientTimeout(total=timeout),
+        trace_configs=[_trace_config(stats)],
+    )
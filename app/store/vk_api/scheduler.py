@@ -0,0 +1,61 @@
+import asyncio
+import heapq
+import itertools
+import time
+from asyncio import Future, TimerHandle
+from typing import Optional
+
+from app.store.vk_api.dataclasses import Priority
+
+
+class RateLimiter:
+    """Token bucket shared by every outgoing API request.
+
+    Requests waiting for a token are served by priority first and then in
+    arrival order. `throttled` halves the rate after VK answered "too many
+    requests" and `succeeded` lets it climb back to the configured one.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.waiters: list[tuple[int, int, Future]] = []
+        self.counter = itertools.count()
+        self.timer: Optional[TimerHandle] = None
+
+    async def acquire(self, priority: int = Priority.REPLY):
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+        if self.timer is None:
+            self._release()
+        await future
+
+    def throttled(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _release(self):
+        self.timer = None
+        self._refill()
+        while self.waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self.waiters)
+            if future.cancelled():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        if self.waiters:
+            self.timer = asyncio.get_event_loop().call_later(
+                (1 - self.tokens) / self.rate, self._release
+            )
@@ -45,6 +45,11 @@ class View(AiohttpView):
     def data(self) -> dict:
         return self.request.get("data", {})
 
+    @property
+    def query(self) -> dict:
+        # querystring_schema validates into its own key, not into data
+        return self.request.get("querystring", {})
+
 
 app = Application()
 
@@ -1,5 +1,6 @@
 import typing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 import yaml
 
@@ -19,11 +20,79 @@ class AdminConfig:
 
 
 @dataclass
-class BotConfig:
+class GroupConfig:
     token: str
     group_id: int
 
 
+@dataclass
+class BotConfig:
+    # a single community can be set with token/group_id, several with groups
+    token: Optional[str] = None
+    group_id: Optional[int] = None
+    groups: list[GroupConfig] = field(default_factory=list)
+    workers: int = 4
+    queue_size: int = 100
+    api_limit_per_host: int = 20
+    api_timeout: float = 10
+    poll_limit_per_host: int = 2
+    poll_timeout: float = 40
+    keepalive_timeout: float = 60
+    dns_cache_ttl: int = 300
+    send_batch_size: int = 25
+    send_batch_delay: float = 0.005
+    rate_limit: float = 20
+    rate_burst: int = 20
+    max_retries: int = 5
+    reconnect_delay: float = 1
+    reconnect_max_delay: float = 60
+    # seconds the keys of handled updates are kept to drop replays
+    dedup_ttl: float = 3600
+    # updates a user may send per second before the rest is dropped, 0 is off
+    user_rate_limit: int = 0
+    checkpoint: str = "database"
+    checkpoint_path: str = "checkpoint.json"
+    checkpoint_interval: float = 1
+    # "auto" uses orjson when it is installed, "json" forces the stdlib
+    json_decoder: str = "auto"
+    # "single" polls and handles updates, "ingest" only polls and publishes
+    # them to the work log, "worker" handles the work log partitions
+    mode: str = "single"
+    partitions: int = 16
+    # worker `worker_index` of `worker_count` owns the partitions p with
+    # p % worker_count == worker_index, unless worker_partitions lists them;
+    # the partitions of two workers must never overlap
+    worker_index: int = 0
+    worker_count: int = 1
+    worker_partitions: list[int] = field(default_factory=list)
+    worklog_batch_size: int = 100
+    worklog_poll_interval: float = 0.1
+    worklog_lease: float = 60
+    # seconds to answer a question, and the resolution of the timer wheel
+    question_timeout: float = 30
+    timer_tick: float = 0.1
+    # questions of a game, fewer if the theme doesn't have that many
+    questions_per_game: int = 10
+    # typos forgiven in free-text answers of 5 letters and longer
+    answer_max_distance: int = 1
+
+    def __post_init__(self):
+        self.groups = [
+            GroupConfig(**group) if isinstance(group, dict) else group
+            for group in self.groups
+        ]
+        if not self.groups and self.token:
+            self.groups = [GroupConfig(token=self.token, group_id=self.group_id)]
+        if not 0 <= self.worker_index < self.worker_count:
+            raise ValueError(
+                f"worker_index {self.worker_index} is not in range({self.worker_count})"
+            )
+        if not self.worker_partitions:
+            self.worker_partitions = list(
+                range(self.worker_index, self.partitions, self.worker_count)
+            )
+
+
 @dataclass
 class DatabaseConfig:
     host: str = "localhost"
@@ -31,6 +100,24 @@ class DatabaseConfig:
     user: str = "postgres"
     password: str = "postgres"
     database: str = "project"
+    # write-behind buffer of game events: rows kept at most, rows and
+    # seconds after which they are written, failed writes before a row the
+    # database rejects is dropped
+    buffer_size: int = 10000
+    buffer_flush_size: int = 1000
+    buffer_flush_interval: float = 1
+    buffer_max_attempts: int = 3
+    # connections opened at startup and at most, queries before one is
+    # replaced, and seconds an idle one is kept open
+    pool_min_size: int = 2
+    pool_max_size: int = 10
+    pool_max_queries: int = 50000
+    pool_max_inactive_lifetime: float = 300
+    # prepared statements kept per connection, 0 turns the cache off
+    # (needed behind pgbouncer in transaction mode)
+    statement_cache_size: int = 1024
+    # seconds a query may run, None waits forever
+    command_timeout: Optional[float] = 60
 
 
 @dataclass
@@ -53,9 +140,6 @@ def setup_config(app: "Application", config_path: str):
             email=raw_config["admin"]["email"],
             password=raw_config["admin"]["password"],
         ),
-        bot=BotConfig(
-            token=raw_config["bot"]["token"],
-            group_id=raw_config["bot"]["group_id"],
-        ),
+        bot=BotConfig(**raw_config["bot"]),
         database=DatabaseConfig(**raw_config["database"]),
     )
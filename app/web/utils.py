@@ -1,7 +1,9 @@
-from typing import Any, Optional
+import json
+from typing import Any, AsyncIterable, Optional
 
 from aiohttp.web import json_response as aiohttp_json_response
-from aiohttp.web_response import Response
+from aiohttp.web_request import Request
+from aiohttp.web_response import Response, StreamResponse
 
 
 def json_response(data: Any = None, status: str = "ok") -> Response:
@@ -31,3 +33,26 @@ def error_json_response(
             "data": data,
         },
     )
+
+
+async def ndjson_response(
+    request: Request, rows: AsyncIterable[dict], chunk_size: int = 100
+) -> StreamResponse:
+    """Writes rows as they come, one JSON document per line.
+
+    Lines are sent `chunk_size` at a time, and every write waits for the
+    client to take the previous one, so a slow client slows the reading
+    down instead of growing the buffer.
+    """
+    response = StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            await response.write(("\n".join(lines) + "\n").encode())
+            lines = []
+    if lines:
+        await response.write(("\n".join(lines) + "\n").encode())
+    await response.write_eof()
+    return response
@@ -1,9 +1,33 @@
+import argparse
+import asyncio
 import os
 
+from app.store.quiz.exporter import export_to_file
 from app.web.app import setup_app
 from aiohttp.web import run_app
 
 # FILE_PATH = '/home/urick0s/PycharmProjects/hw-backend-summer-2021-3-db_gino/'
 
 if __name__ == "__main__":
-    run_app(setup_app(config_path=os.path.join(os.path.dirname(__file__), 'config.yml')))
+    # ingest and worker processes run from their own config (bot.mode)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="serve",
+        choices=("serve", "export"),
+        help="export writes the quiz as gzip-compressed NDJSON and exits",
+    )
+    parser.add_argument(
+        "--config", default=os.path.join(os.path.dirname(__file__), "config.yml")
+    )
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--output", default="quiz.ndjson.gz")
+    args = parser.parse_args()
+    app = setup_app(config_path=args.config)
+    if args.command == "export":
+        # the default loop, like run_app, which the app was set up for
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(export_to_file(app, args.output))
+    else:
+        run_app(app, port=args.port)
@@ -1,3 +1,4 @@
+from app.store.bot.manager import HELP
 from app.store.vk_api.dataclasses import Update, UpdateObject, Message
 
 
@@ -23,3 +24,31 @@ class TestHandleUpdates:
         message: Message = store.vk_api.send_message.mock_calls[0].args[0]
         assert message.user_id == 1
         assert message.text
+
+    async def test_reply_from_update_group(self, store):
+        await store.bots_manager.handle_updates(
+            updates=[
+                Update(
+                    type="message_new",
+                    object=UpdateObject(id=1, user_id=1, body="kek"),
+                    group_id=2,
+                )
+            ]
+        )
+        message: Message = store.vk_api.send_message.mock_calls[-1].args[0]
+        assert message.group_id == 2
+
+    async def test_chat_gets_help_only_on_command(self, store):
+        def chat_message(body: str) -> Update:
+            return Update(
+                type="message_new",
+                object=UpdateObject(id=0, user_id=1, body=body, peer_id=2000000001),
+            )
+
+        store.vk_api.send_message.reset_mock()
+        await store.bots_manager.handle_update(chat_message("kek"))
+        assert store.vk_api.send_message.called is False
+
+        await store.bots_manager.handle_update(chat_message("/help"))
+        message: Message = store.vk_api.send_message.mock_calls[-1].args[0]
+        assert message.text == HELP and message.peer_id == 2000000001
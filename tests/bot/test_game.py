@@ -0,0 +1,224 @@
+from unittest.mock import patch
+
+from app.bot.models import GameSessionModel
+from app.store.bot.game import (
+    ACTIVE,
+    ALREADY_STARTED,
+    FINISHED,
+    NO_QUESTIONS,
+    NOT_STARTED,
+    RIGHT,
+    TIME_IS_UP,
+    WRONG,
+    GameEngine,
+)
+from app.store.bot.manager import START
+from app.store.vk_api.dataclasses import Update, UpdateObject, Message
+from tests.utils import check_empty_table_exists
+
+PEER_ID = 2000000001
+
+
+def make_update(body: str, user_id: int = 1, peer_id: int = PEER_ID) -> Update:
+    return Update(
+        type="message_new",
+        object=UpdateObject(id=1, user_id=user_id, body=body, peer_id=peer_id),
+        group_id=1,
+    )
+
+
+def correct_number(games: GameEngine, peer_id: int = PEER_ID) -> str:
+    session = games.sessions[peer_id]
+    question = games.bank.questions[session.question_id]
+    for number, answer in enumerate(question.answers, start=1):
+        if answer.is_correct:
+            return str(number)
+
+
+class TestGameEngine:
+    async def test_table_exists(self, cli):
+        await check_empty_table_exists(cli, "game_sessions")
+
+    async def test_no_questions(self, store):
+        assert await store.bots_manager.games.start(PEER_ID) == NO_QUESTIONS
+        assert store.bots_manager.games.sessions == {}
+
+    async def test_start(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        text = await games.start(PEER_ID, group_id=1)
+
+        session = games.sessions[PEER_ID]
+        assert session.deck.size == session.rounds == 2
+        assert session.question_id in (question_1.id, question_2.id)
+        assert text.startswith("Вопрос 1: ")
+        assert await games.start(PEER_ID) == ALREADY_STARTED
+
+        row = await GameSessionModel.get(session.id)
+        assert row.status == ACTIVE and row.peer_id == PEER_ID
+        assert row.deck_step == session.deck.step
+
+    async def test_questions_are_not_repeated(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        first = games.sessions[PEER_ID].question_id
+        await games.expire(PEER_ID)
+
+        assert {first, games.sessions[PEER_ID].question_id} == {
+            question_1.id,
+            question_2.id,
+        }
+        await games.stop(PEER_ID)
+
+    async def test_start_with_theme(
+        self, store, theme_1, theme_2, question_1, answers
+    ):
+        question = await store.quizzes.create_question("other", theme_2.id, answers)
+        games = GameEngine(store.quizzes.app)
+
+        await games.start(PEER_ID, theme_id=theme_2.id)
+        session = games.sessions[PEER_ID]
+        assert session.question_id == question.id and session.rounds == 1
+        await games.stop(PEER_ID)
+        assert await games.start(PEER_ID, theme_id=theme_2.id + 1) == NO_QUESTIONS
+
+    async def test_game_length_is_limited(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        games.questions_per_game = 1
+        await games.start(PEER_ID)
+
+        assert "окончена" in await games.expire(PEER_ID)
+
+    async def test_answers_are_checked_in_memory(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+
+        with patch.object(store.quizzes, "list_questions") as list_questions:
+            assert await games.answer(PEER_ID, 1, "не знаю") == WRONG
+            number = correct_number(games)
+            text = await games.answer(PEER_ID, 1, f"  {number} ")
+            assert list_questions.called is False
+
+        assert text.startswith(f"{RIGHT}\nВопрос 2: ")
+        session = games.sessions[PEER_ID]
+        assert session.scores == {1: 1}
+        await store.quizzes.app.database.buffer.flush()
+        row = await GameSessionModel.get(session.id)
+        assert row.position == 1 and row.scores == {"1": 1}
+
+    async def test_game_is_finished_after_last_question(
+        self, store, question_1, question_2
+    ):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        session = games.sessions[PEER_ID]
+        await games.answer(PEER_ID, 1, correct_number(games))
+        text = await games.answer(PEER_ID, 2, correct_number(games))
+
+        assert PEER_ID not in games.sessions
+        assert "id1: 1" in text and "id2: 1" in text
+        await store.quizzes.app.database.buffer.flush()
+        row = await GameSessionModel.get(session.id)
+        assert row.status == FINISHED and row.finished_at is not None
+        assert await games.answer(PEER_ID, 1, "1") == NOT_STARTED
+
+    async def test_stop(self, store, question_1):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        session = games.sessions[PEER_ID]
+
+        assert "окончена" in await games.stop(PEER_ID)
+        await store.quizzes.app.database.buffer.flush()
+        assert (await GameSessionModel.get(session.id)).status == FINISHED
+        assert await games.stop(PEER_ID) == NOT_STARTED
+
+    async def test_active_sessions_are_restored(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        await games.answer(PEER_ID, 7, correct_number(games))
+        await store.quizzes.app.database.buffer.flush()
+
+        restored = GameEngine(store.quizzes.app)
+        await restored.restore()
+
+        session = restored.sessions[PEER_ID]
+        assert session.position == 1 and session.scores == {7: 1}
+        assert session.question_id == games.sessions[PEER_ID].question_id
+        assert session.matcher is games.sessions[PEER_ID].matcher
+
+    async def test_worker_restores_own_partitions(
+        self, store, question_1, question_2
+    ):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        await games.start(PEER_ID + 1)
+
+        bot = store.quizzes.app.config.bot
+        with patch.multiple(
+            bot, mode="worker", partitions=2, worker_partitions=[PEER_ID % 2]
+        ):
+            restored = GameEngine(store.quizzes.app)
+            await restored.restore()
+
+        assert list(restored.sessions) == [PEER_ID]
+        for peer_id in (PEER_ID, PEER_ID + 1):
+            await games.stop(peer_id)
+
+    async def test_ingest_has_no_games(self, store, question_1):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        manager, timers = store.bots_manager, store.timers
+        app = store.quizzes.app
+
+        with patch.object(app.config.bot, "mode", "ingest"), patch.object(
+            manager.games, "restore"
+        ) as restore:
+            await manager.connect(app)
+            await timers.connect(app)
+
+        assert restore.called is False and timers.task is None
+        await timers.connect(app)
+        assert timers.task is not None
+        await timers.disconnect(app)
+        timers.task = None
+        await games.stop(PEER_ID)
+
+    async def test_question_deadline(self, store, question_1, question_2):
+        games = GameEngine(store.quizzes.app)
+        await games.start(PEER_ID)
+        assert PEER_ID in store.timers.wheel
+
+        text = await games.expire(PEER_ID)
+        assert text.startswith(TIME_IS_UP) and "Вопрос 2: " in text
+        assert games.sessions[PEER_ID].scores == {}
+        assert PEER_ID in store.timers.wheel
+
+        await games.stop(PEER_ID)
+        assert PEER_ID not in store.timers.wheel
+        assert await games.expire(PEER_ID) is None
+
+
+class TestGameCommands:
+    async def test_start_replies_in_chat(self, store, question_1):
+        await store.bots_manager.handle_update(make_update(START))
+
+        message: Message = store.vk_api.send_message.mock_calls[-1].args[0]
+        assert message.peer_id == PEER_ID and message.group_id == 1
+        assert message.text.startswith("Вопрос 1: ")
+        store.bots_manager.games.sessions.clear()
+
+    async def test_start_with_theme(self, store, theme_1, question_1):
+        games = store.bots_manager.games
+        await store.bots_manager.handle_update(make_update(f"{START} {theme_1.id}"))
+
+        assert games.sessions[PEER_ID].theme_id == theme_1.id
+        await games.stop(PEER_ID)
+
+    async def test_timeouts_are_sent_to_chat(self, store, question_1, question_2):
+        games = store.bots_manager.games
+        await games.start(PEER_ID, group_id=1)
+        await store.bots_manager.handle_timeouts([PEER_ID, 42])
+
+        message: Message = store.vk_api.send_message.mock_calls[-1].args[0]
+        assert message.peer_id == PEER_ID and message.group_id == 1
+        assert message.text.startswith(TIME_IS_UP)
+        await games.stop(PEER_ID)
@@ -0,0 +1,330 @@
+import asyncio
+
+import pytest
+
+from app.store.bot.pipeline import Dedup, Metrics, Pipeline, UserRateLimit
+from app.store.vk_api.dataclasses import Update, UpdateObject, UpdateBatch
+
+
+def make_update(id_: int, user_id: int) -> Update:
+    return Update(
+        type="message_new",
+        object=UpdateObject(id=id_, user_id=user_id, body="kek"),
+    )
+
+
+def make_source(batches: list):
+    ts = iter(range(1, len(batches) + 1))
+
+    async def poll():
+        if batches:
+            return UpdateBatch(ts=next(ts), updates=batches.pop(0))
+        await asyncio.sleep(3600)
+
+    return poll
+
+
+class TestPipeline:
+    async def test_updates_are_dispatched(self):
+        source = make_source([[make_update(1, 1), make_update(2, 2)]])
+        handled = []
+
+        async def handle_update(update):
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(source, handle_update, workers=2, queue_size=10)
+        await pipeline.start()
+        await asyncio.sleep(0.01)
+        await pipeline.stop()
+
+        assert sorted(handled) == [1, 2]
+
+    async def test_user_order_is_kept(self):
+        source = make_source(
+            [
+                [make_update(1, 1), make_update(2, 2)],
+                [make_update(3, 1), make_update(4, 2), make_update(5, 1)],
+            ]
+        )
+        handled = []
+
+        async def handle_update(update):
+            # the first update of every user is slow, later ones must wait
+            if update.object.id in (1, 2):
+                await asyncio.sleep(0.01)
+            handled.append((update.object.user_id, update.object.id))
+
+        pipeline = Pipeline(source, handle_update, workers=2, queue_size=10)
+        await pipeline.start()
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+
+        assert [i for user_id, i in handled if user_id == 1] == [1, 3, 5]
+        assert [i for user_id, i in handled if user_id == 2] == [2, 4]
+
+    async def test_chat_order_is_kept(self):
+        def chat_update(id_: int, user_id: int) -> Update:
+            return Update(
+                type="message_new",
+                object=UpdateObject(id=id_, user_id=user_id, body="", peer_id=10),
+            )
+
+        source = make_source([[chat_update(1, 1), chat_update(2, 2)]])
+        handled = []
+
+        async def handle_update(update):
+            # the players of a chat share its game, a later answer must wait
+            if update.object.id == 1:
+                await asyncio.sleep(0.01)
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(source, handle_update, workers=2, queue_size=10)
+        await pipeline.start()
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+
+        assert handled == [1, 2]
+
+    async def test_slow_reply_does_not_block_polling(self):
+        source = make_source([[make_update(1, 1)], [make_update(2, 2)]])
+        release = asyncio.Event()
+        handled = []
+
+        async def handle_update(update):
+            if update.object.id == 1:
+                await release.wait()
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(source, handle_update, workers=2, queue_size=10)
+        await pipeline.start()
+        await asyncio.sleep(0.01)
+        assert handled == [2]
+
+        release.set()
+        await pipeline.stop()
+        assert handled == [2, 1]
+
+    async def test_handler_error_does_not_stop_worker(self):
+        source = make_source([[make_update(1, 1)], [make_update(2, 1)]])
+        handled = []
+
+        async def handle_update(update):
+            if update.object.id == 1:
+                raise RuntimeError
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(source, handle_update, workers=1, queue_size=10)
+        await pipeline.start()
+        await asyncio.sleep(0.01)
+        await pipeline.stop()
+
+        assert handled == [2]
+
+    async def test_source_error_does_not_stop_polling(self):
+        poll = make_source([[make_update(1, 1)]])
+        calls = 0
+
+        async def source():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise ValueError("unexpected character")
+            return await poll()
+
+        handled = []
+
+        async def handle_update(update):
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(source, handle_update, retry_delay=0)
+        await pipeline.start()
+        await asyncio.sleep(0.01)
+        assert not pipeline.poll_task.done()
+        await pipeline.stop()
+
+        assert handled == [1] and calls == 3
+
+    async def test_duplicates_are_skipped(self):
+        source = make_source(
+            [[make_update(1, 1), make_update(2, 1)], [make_update(1, 1)]]
+        )
+        handled = []
+
+        async def handle_update(update):
+            handled.append(update.object.id)
+
+        dedup = Dedup()
+        pipeline = Pipeline(
+            source, handle_update, workers=1, queue_size=10, dedup=dedup
+        )
+        await pipeline.start()
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+
+        assert handled == [1, 2]
+        assert dedup.dropped == 1
+        # dropped updates still complete their batch
+        assert pipeline.processed_ts == 2
+
+    async def test_processed_ts_waits_for_earlier_batches(self):
+        source = make_source([[make_update(1, 1)], [make_update(2, 2)], []])
+        release = asyncio.Event()
+        processed = []
+
+        async def handle_update(update):
+            if update.object.id == 1:
+                await release.wait()
+
+        pipeline = Pipeline(
+            source,
+            handle_update,
+            workers=2,
+            queue_size=10,
+            on_processed=processed.append,
+        )
+        await pipeline.start()
+        await asyncio.sleep(0.01)
+        # batch 2 is done, but batch 1 is still being handled
+        assert pipeline.processed_ts is None and processed == []
+
+        release.set()
+        await pipeline.stop()
+        assert processed == [1, 2, 3]
+        assert pipeline.processed_ts == 3
+
+
+class TestDedup:
+    @staticmethod
+    def chat_message(user_id: int, number: int) -> Update:
+        return Update(
+            type="message_new",
+            object=UpdateObject(
+                id=0,
+                user_id=user_id,
+                body="kek",
+                peer_id=2000000001,
+                conversation_message_id=number,
+            ),
+            group_id=1,
+        )
+
+    async def test_chat_messages_with_id_0(self, store):
+        updates = [self.chat_message(1, 1), self.chat_message(2, 2)]
+        assert await Dedup().filter(updates) == updates
+
+    async def test_replays_after_restart(self, store):
+        first = [make_update(1, 1), make_update(2, 1), make_update(3, 1)]
+        dedup = Dedup()
+        assert await dedup.filter(first) == first
+        await dedup.done(first[0], handled=True)
+        await dedup.done(first[1], handled=False)
+        # the process stops before update 3 is handled
+
+        # a new process, resumed from a checkpoint older than the updates
+        dedup = Dedup()
+        replayed = first + [make_update(3, 1)]
+        assert await dedup.filter(replayed) == first[1:]
+        assert dedup.dropped == 2
+
+    async def test_queued_updates_are_not_queued_again(self, store):
+        dedup = Dedup()
+        assert await dedup.filter([make_update(1, 1)]) == [make_update(1, 1)]
+        assert await dedup.filter([make_update(1, 1)]) == []
+
+        dedup.release(make_update(1, 1))
+        assert await dedup.filter([make_update(1, 1)]) == [make_update(1, 1)]
+
+    async def test_expired_keys_are_pruned(self, store):
+        dedup = Dedup(ttl=0)
+        await dedup.filter([make_update(1, 1)])
+        await dedup.done(make_update(1, 1), handled=True)
+        await dedup.prune()
+
+        assert await dedup.filter([make_update(1, 1)]) == [make_update(1, 1)]
+
+    async def test_updates_left_by_a_stop_are_replayed(self, store):
+        batch = [make_update(i, 1) for i in range(1, 6)]
+        handled = []
+        first_handled = asyncio.Event()
+
+        async def handle_update(update):
+            await asyncio.sleep(0.01)
+            handled.append(update.object.id)
+            first_handled.set()
+
+        # a full queue when the pipeline stops, the checkpoint stays behind
+        pipeline = Pipeline(
+            make_source([list(batch)]), handle_update, queue_size=1, dedup=Dedup()
+        )
+        await pipeline.start()
+        await asyncio.wait_for(first_handled.wait(), 1)
+        await pipeline.stop()
+        assert 0 < len(handled) < 5 and pipeline.processed_ts is None
+
+        # the restart gets the same batch from the long poll again
+        pipeline = Pipeline(
+            make_source([list(batch)]), handle_update, queue_size=1, dedup=Dedup()
+        )
+        await pipeline.start()
+        while len(handled) < 5:
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+        # nothing is lost, and what was handled before is not handled again
+        assert handled == [1, 2, 3, 4, 5]
+
+
+class TestStages:
+    async def test_stages_see_the_same_object_in_order(self):
+        update = make_update(1, 1)
+        seen = []
+
+        def stage(name):
+            async def call(update, handler):
+                seen.append((name, update))
+                await handler(update)
+
+            return call
+
+        async def handle_update(update):
+            seen.append(("handler", update))
+
+        pipeline = Pipeline(
+            make_source([]), handle_update, stages=[stage("a"), stage("b")]
+        )
+        await pipeline.handler(update)
+
+        assert [name for name, _ in seen] == ["a", "b", "handler"]
+        assert all(u is update for _, u in seen)
+
+    async def test_metrics(self):
+        async def handle_update(update):
+            if update.object.id == 2:
+                raise RuntimeError
+
+        metrics = Metrics()
+        pipeline = Pipeline(make_source([]), handle_update, stages=[metrics])
+        await pipeline.handler(make_update(1, 1))
+        with pytest.raises(RuntimeError):
+            await pipeline.handler(make_update(2, 1))
+
+        assert metrics.stats.received == 2
+        assert metrics.stats.handled == 1 and metrics.stats.failed == 1
+
+    async def test_user_rate_limit(self):
+        handled = []
+
+        async def handle_update(update):
+            handled.append(update.object.id)
+
+        limit = UserRateLimit(limit=2, period=60)
+        pipeline = Pipeline(make_source([]), handle_update, stages=[limit])
+        for i in range(4):
+            await pipeline.handler(make_update(i, user_id=1))
+        await pipeline.handler(make_update(4, user_id=2))
+
+        assert handled == [0, 1, 4]
+        assert limit.dropped == 2
+
+        limit.window_start -= 60
+        await pipeline.handler(make_update(5, user_id=1))
+        assert handled[-1] == 5
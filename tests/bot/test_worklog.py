@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from app.bot.models import UpdateLogModel
+from app.store.bot.pipeline import Dedup
+from app.store.bot.worklog import Ingester, WorkLog
+from app.store.vk_api.dataclasses import Update, UpdateBatch, UpdateObject
+from app.web.config import BotConfig
+from tests.utils import check_empty_table_exists
+
+
+def make_update(id_: int, user_id: int) -> Update:
+    return Update(
+        type="message_new",
+        object=UpdateObject(id=id_, user_id=user_id, body="kek"),
+        group_id=1,
+    )
+
+
+class TestWorkLog:
+    async def test_table_exists(self, cli):
+        await check_empty_table_exists(cli, "update_log")
+
+    async def test_claim_own_partitions_in_order(self, cli):
+        await WorkLog(partitions=2, worker_partitions=[]).publish(
+            [make_update(i, user_id=i) for i in range(1, 7)]
+        )
+        worklog = WorkLog(partitions=2, worker_partitions=[1])
+
+        claimed = await worklog.claim()
+        assert [update.object.id for _, update in claimed] == [1, 3, 5]
+        assert claimed[0][1] == make_update(1, user_id=1)
+        # claimed rows are not handed out twice while the lease lasts
+        assert await worklog.claim() == []
+
+    def test_chat_updates_share_a_partition(self):
+        worklog = WorkLog(partitions=4)
+        chat = [
+            Update(
+                type="message_new",
+                object=UpdateObject(id=0, user_id=user_id, body="", peer_id=7),
+            )
+            for user_id in (1, 2, 3)
+        ]
+        assert {worklog.partition_of(update) for update in chat} == {3}
+
+    async def test_expired_lease_is_claimed_again(self, cli):
+        worklog = WorkLog(partitions=1, worker_partitions=[0], lease=0)
+        await worklog.publish([make_update(1, 1)])
+        assert len(await worklog.claim()) == 1
+        await asyncio.sleep(0.01)
+        assert len(await worklog.claim()) == 1
+
+    async def test_ack_deletes_handled_rows(self, cli):
+        worklog = WorkLog(partitions=1, worker_partitions=[0], batch_size=2)
+        await worklog.publish([make_update(i, 1) for i in range(1, 4)])
+        batch = await worklog.poll()
+        assert [u.object.id for u in batch.updates] == [1, 2]
+
+        await worklog.save(0, batch.ts)
+
+        rows = await UpdateLogModel.query.gino.all()
+        assert [row.payload["object"]["id"] for row in rows] == [3]
+        assert rows[0].claimed_at is None
+
+    async def test_ack_keeps_rows_claimed_by_others(self, cli):
+        worklog = WorkLog(partitions=1, worker_partitions=[0], batch_size=1)
+        await worklog.publish([make_update(1, 1), make_update(2, 1)])
+        mine = await worklog.poll()
+        # e.g. the lease of a slow worker ran out and another took the row
+        other = WorkLog(partitions=1, worker_partitions=[0], batch_size=1)
+        theirs = await other.poll()
+
+        await worklog.save(0, theirs.ts)
+
+        rows = await UpdateLogModel.query.gino.all()
+        assert [row.id for row in rows] == [theirs.ts]
+        assert mine.ts < theirs.ts
+        await other.save(0, theirs.ts)
+        assert await UpdateLogModel.query.gino.all() == []
+
+    async def test_lease_redelivers_unhandled_rows(self, cli):
+        worklog = WorkLog(partitions=1, worker_partitions=[0])
+        await worklog.publish([make_update(1, 1), make_update(2, 1)])
+        dedup = Dedup()
+        batch = await worklog.poll()
+        queued = await dedup.filter(batch.updates)
+        await dedup.done(queued[0], handled=True)
+        # the worker dies before it handles update 2 and before it acks
+
+        replacement = WorkLog(partitions=1, worker_partitions=[0], lease=0)
+        batch = await replacement.poll()
+        redelivered = await Dedup().filter(batch.updates)
+
+        assert [update.object.id for update in redelivered] == [2]
+
+    def test_partitions_out_of_range(self):
+        with pytest.raises(ValueError):
+            WorkLog(partitions=2, worker_partitions=[2])
+
+
+class TestWorkerPartitions:
+    def test_derived_from_worker_index(self):
+        owned = [
+            BotConfig(partitions=8, worker_index=i, worker_count=3).worker_partitions
+            for i in range(3)
+        ]
+        assert owned == [[0, 3, 6], [1, 4, 7], [2, 5]]
+
+    def test_explicit_partitions(self):
+        config = BotConfig(partitions=8, worker_partitions=[5])
+        assert config.worker_partitions == [5]
+
+    def test_worker_index_out_of_range(self):
+        with pytest.raises(ValueError):
+            BotConfig(worker_index=2, worker_count=2)
+
+
+class TestIngester:
+    async def test_batches_are_published(self, cli):
+        batches = [UpdateBatch(ts=5, updates=[make_update(1, 1), make_update(2, 2)])]
+        processed = []
+
+        async def source():
+            if batches:
+                return batches.pop(0)
+            await asyncio.sleep(3600)
+
+        worklog = WorkLog(partitions=4, worker_partitions=[])
+        ingester = Ingester(source, worklog, on_processed=processed.append)
+        await ingester.start()
+        await asyncio.sleep(0.05)
+        await ingester.stop()
+
+        rows = await UpdateLogModel.query.order_by(UpdateLogModel.id).gino.all()
+        assert [(row.partition, row.payload["object"]["id"]) for row in rows] == [
+            (1, 1),
+            (2, 2),
+        ]
+        assert processed == [5]
+
+    async def test_source_error_does_not_stop_ingest(self, cli):
+        batches = [UpdateBatch(ts=5, updates=[make_update(1, 1)])]
+        calls = 0
+
+        async def source():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise KeyError("type")
+            if batches:
+                return batches.pop(0)
+            await asyncio.sleep(3600)
+
+        processed = []
+        worklog = WorkLog(partitions=1)
+        ingester = Ingester(
+            source, worklog, on_processed=processed.append, retry_delay=0
+        )
+        await ingester.start()
+        await asyncio.sleep(0.05)
+        assert not ingester.task.done()
+        await ingester.stop()
+
+        assert processed == [5]
+        assert len(await UpdateLogModel.query.gino.all()) == 1
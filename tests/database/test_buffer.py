@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from asyncpg import NotNullViolationError
+
+from app.bot.models import GameSessionModel, UpdateLogModel
+from app.leaderboard.models import ScoreModel
+from app.store.database.gino import db
+from app.store.bot.game import ACTIVE, GAME_SESSIONS
+from app.store.database.buffer import MAX_ARGUMENTS, Channel, WriteBehindBuffer
+from app.store.leaderboard.accessor import SCORES
+
+UPDATE_LOG = Channel(table=UpdateLogModel.__table__)
+
+
+def log_row(partition: int) -> dict:
+    return {"partition": partition, "payload": {}}
+
+
+def session_row(id_: int) -> dict:
+    return {
+        "id": id_,
+        "peer_id": id_,
+        "group_id": 1,
+        "status": ACTIVE,
+        "theme_id": None,
+        "deck_size": 10,
+        "deck_step": 3,
+        "deck_offset": 0,
+        "rounds": 10,
+        "position": 1,
+        "scores": {},
+        "finished_at": None,
+    }
+
+
+class TestWriteBehindBuffer:
+    async def test_rows_are_written_on_flush(self, cli):
+        buffer = WriteBehindBuffer()
+        for partition in range(3):
+            await buffer.put(UPDATE_LOG, log_row(partition))
+        await buffer.put(SCORES, {"peer_id": 1, "user_id": 1, "score": 1})
+        await buffer.put(SCORES, {"peer_id": 1, "user_id": 1, "score": 2})
+        assert buffer.size == 4
+        assert await UpdateLogModel.query.gino.all() == []
+
+        await buffer.flush()
+        rows = await UpdateLogModel.query.gino.all()
+        assert sorted(row.partition for row in rows) == [0, 1, 2]
+        assert (await ScoreModel.query.gino.first()).score == 3
+        assert buffer.size == 0
+
+    async def test_full_buffer_blocks_until_flushed(self, cli):
+        buffer = WriteBehindBuffer(max_size=2)
+        await buffer.put(UPDATE_LOG, log_row(1))
+        await buffer.put(UPDATE_LOG, log_row(2))
+        blocked = asyncio.create_task(buffer.put(UPDATE_LOG, log_row(3)))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        await buffer.flush()
+        await asyncio.wait_for(blocked, 1)
+        assert buffer.size == 1
+
+    async def test_writer_flushes_on_size(self, cli):
+        buffer = WriteBehindBuffer(flush_size=2, flush_interval=60)
+        await buffer.start()
+        await buffer.put(UPDATE_LOG, log_row(1))
+        await buffer.put(UPDATE_LOG, log_row(2))
+        await asyncio.sleep(0.05)
+        assert len(await UpdateLogModel.query.gino.all()) == 2
+
+        await buffer.put(UPDATE_LOG, log_row(3))
+        await buffer.stop()
+        assert len(await UpdateLogModel.query.gino.all()) == 3
+
+    async def test_writer_survives_errors(self, cli, monkeypatch):
+        buffer = WriteBehindBuffer(flush_interval=0.01)
+        flush = buffer.flush
+        calls = []
+
+        async def broken_flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("broken")
+            await flush()
+
+        monkeypatch.setattr(buffer, "flush", broken_flush)
+        await buffer.start()
+        await buffer.put(UPDATE_LOG, log_row(1))
+        await asyncio.sleep(0.1)
+        assert not buffer.task.done()
+        assert len(await UpdateLogModel.query.gino.all()) == 1
+        await buffer.stop()
+
+    def test_events_are_made_on_the_loop(self):
+        buffer = WriteBehindBuffer()
+        assert buffer.full is None and buffer.drained is None
+
+    async def test_more_rows_than_one_statement_takes(self, cli):
+        rows = MAX_ARGUMENTS // len(session_row(1)) + 270
+        buffer = WriteBehindBuffer(max_size=rows + 1)
+        for id_ in range(1, rows + 1):
+            await buffer.put(GAME_SESSIONS, session_row(id_))
+
+        await buffer.flush()
+        assert buffer.size == 0
+        assert await db.func.count(GameSessionModel.id).gino.scalar() == rows
+
+    async def test_failed_statement_keeps_its_rows(self, cli):
+        buffer = WriteBehindBuffer()
+        await buffer.put(SCORES, {"peer_id": 1, "user_id": 1, "score": 1})
+        await buffer.put(UPDATE_LOG, {"partition": None, "payload": {}})
+        with pytest.raises(NotNullViolationError):
+            await buffer.flush()
+
+        # the scores are written on their own, only the rejected row waits
+        assert (await ScoreModel.query.gino.first()).score == 1
+        assert buffer.size == 1 and SCORES not in buffer.rows
+        assert list(buffer.rows[UPDATE_LOG].values()) == [
+            {"partition": None, "payload": {}}
+        ]
+
+    async def test_rejected_rows_are_dropped(self, cli):
+        buffer = WriteBehindBuffer(max_attempts=2)
+        await buffer.put(UPDATE_LOG, log_row(1))
+        await buffer.put(UPDATE_LOG, {"partition": None, "payload": {}})
+        await buffer.put(UPDATE_LOG, log_row(2))
+        with pytest.raises(NotNullViolationError):
+            await buffer.flush()
+        assert buffer.size == 3
+
+        # the rows of the statement are written one by one, the bad one is lost
+        with pytest.raises(NotNullViolationError):
+            await buffer.flush()
+        rows = await UpdateLogModel.query.gino.all()
+        assert sorted(row.partition for row in rows) == [1, 2]
+        assert buffer.size == 0 and buffer.attempts == {}
+
+        await buffer.flush()
+        assert len(await UpdateLogModel.query.gino.all()) == 2
+
+    async def test_failed_flush_merges_with_new_rows(self, cli):
+        buffer = WriteBehindBuffer()
+        await buffer.put(SCORES, {"peer_id": 1, "user_id": None, "score": 1})
+        with pytest.raises(NotNullViolationError):
+            await buffer.flush()
+        await buffer.put(SCORES, {"peer_id": 1, "user_id": None, "score": 2})
+
+        assert buffer.size == 1
+        assert buffer.rows[SCORES][(1, None)]["score"] == 3
+        assert await ScoreModel.query.gino.all() == []
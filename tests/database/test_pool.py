@@ -0,0 +1,54 @@
+import pytest
+from asyncpg import NotNullViolationError
+
+from app.bot.models import UpdateLogModel
+from app.store.database.buffer import Channel
+from app.store.database.database import Database
+from app.store.database.gino import db
+
+
+class TestConnectionPool:
+    async def test_min_size_is_opened(self, server, cli):
+        stats = server.database.pool_stats
+
+        assert stats.min_size == server.config.database.pool_min_size
+        assert stats.size >= stats.min_size
+        assert stats.in_use == 0 and stats.saturation == 0
+
+    async def test_saturation_is_counted(self, server, cli):
+        stats = server.database.pool_stats
+        acquired, exhausted = stats.acquired, stats.exhausted
+
+        connections = [await db.acquire() for _ in range(stats.max_size)]
+        try:
+            assert stats.in_use == stats.max_size and stats.saturation == 1
+            assert stats.acquired - acquired == stats.max_size
+            assert stats.exhausted == exhausted + 1
+        finally:
+            for conn in connections:
+                await conn.release()
+        assert stats.in_use == 0 and stats.size == stats.max_size
+
+    async def test_disconnect_closes_engine(self, server, cli):
+        database = Database(server)
+        await database.connect()
+        # connect rebinds the shared db, it's bound back below
+        engine = database._engine
+        raw_pool = engine.raw_pool
+
+        await database.disconnect()
+        assert raw_pool._closed
+        await server.database.connect()
+
+    async def test_failed_last_flush_closes_engine(self, server, cli):
+        database = Database(server)
+        await database.connect()
+        raw_pool = database._engine.raw_pool
+        await database.buffer.put(
+            Channel(table=UpdateLogModel.__table__), {"partition": None, "payload": {}}
+        )
+
+        with pytest.raises(NotNullViolationError):
+            await database.disconnect()
+        assert raw_pool._closed
+        await server.database.connect()
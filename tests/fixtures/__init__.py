@@ -1,2 +1,4 @@
 from .common import *
+from .leaderboard import *
 from .quiz import *
+from .vk_api import *
@@ -44,8 +44,14 @@ def store(server) -> Store:
 
 
 @pytest.fixture(autouse=True, scope="function")
-async def clear_db(server):
+async def clear_db(server, cli):
+    # depends on cli to run before the app shuts down and closes the engine
+    # the bank reloads in the background, a test starts from the tables
+    await server.store.quizzes.refresh_bank()
     yield
+    # rows a test left in the write-behind buffer must not outlive it
+    await server.database.buffer.flush()
+    server.store.quizzes.themes.invalidate()
     db = server.database.db
     for table in db.sorted_tables:
         await db.status(db.text(f"TRUNCATE {table.name} CASCADE"))
@@ -0,0 +1,11 @@
+import pytest
+
+from app.store import Store
+from app.store.leaderboard.accessor import LeaderboardAccessor
+
+
+@pytest.fixture
+def leaderboard(store: Store) -> LeaderboardAccessor:
+    # the test app lives for the whole session, start from empty boards
+    store.leaderboard.boards = {}
+    return store.leaderboard
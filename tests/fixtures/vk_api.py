@@ -0,0 +1,31 @@
+from unittest.mock import Mock
+
+import pytest
+
+from app.store.vk_api.accessor import VkApiAccessor
+from app.store.vk_api.group import GroupClient
+from app.web.config import BotConfig
+
+
+@pytest.fixture
+async def vk_api() -> VkApiAccessor:
+    app = Mock()
+    app.config.bot = BotConfig(
+        token="token",
+        group_id=1,
+        max_retries=2,
+        rate_limit=1000,
+        rate_burst=1000,
+        reconnect_delay=0.001,
+        reconnect_max_delay=0.01,
+    )
+    accessor = VkApiAccessor(app)
+    accessor.open()
+    yield accessor
+    await accessor.session.close()
+    await accessor.poll_session.close()
+
+
+@pytest.fixture
+def vk_group(vk_api) -> GroupClient:
+    return vk_api.group()
@@ -0,0 +1,126 @@
+from app.leaderboard.models import Score, ScoreModel
+from app.store.bot.manager import TOP
+from app.store.leaderboard.accessor import SCORES
+from app.store.leaderboard.board import Leaderboard
+from app.store.vk_api.dataclasses import Update, UpdateObject
+from tests.utils import check_empty_table_exists, ok_response
+
+
+class TestLeaderboard:
+    def test_ranking_follows_scores(self):
+        board = Leaderboard()
+        board.add(1, 3)
+        board.add(2, 5)
+        board.add(3, 1)
+        assert [s.user_id for s in board.top()] == [2, 1, 3]
+
+        board.add(3, 10)
+        assert board.top(limit=2) == [Score(1, 3, 11), Score(2, 2, 5)]
+        assert board.top(offset=2) == [Score(3, 1, 3)]
+        assert board.place(1) == 3 and board.place(9) is None
+        assert len(board.ranking) == len(board) == 3
+
+    def test_load(self):
+        board = Leaderboard()
+        board.load({1: 2, 2: 7})
+        board.add(1, 6)
+        assert board.top() == [Score(1, 1, 8), Score(2, 2, 7)]
+
+
+class TestLeaderboardAccessor:
+    async def test_table_exists(self, cli):
+        await check_empty_table_exists(cli, "scores")
+
+    async def test_deltas_are_flushed_in_one_upsert(self, server, leaderboard):
+        await leaderboard.add(peer_id=10, user_id=1)
+        await leaderboard.add(peer_id=10, user_id=1)
+        await leaderboard.add(peer_id=20, user_id=1)
+        await leaderboard.add(peer_id=20, user_id=2)
+        buffer = server.database.buffer
+        assert list(buffer.rows[SCORES].values()) == [
+            {"peer_id": 10, "user_id": 1, "score": 2},
+            {"peer_id": 20, "user_id": 1, "score": 1},
+            {"peer_id": 20, "user_id": 2, "score": 1},
+        ]
+        await buffer.flush()
+        await leaderboard.add(peer_id=10, user_id=1)
+        await buffer.flush()
+
+        rows = await ScoreModel.query.order_by(
+            ScoreModel.peer_id, ScoreModel.user_id
+        ).gino.all()
+        assert [(r.peer_id, r.user_id, r.score) for r in rows] == [
+            (10, 1, 3),
+            (20, 1, 1),
+            (20, 2, 1),
+        ]
+        assert buffer.size == 0
+
+    async def test_load(self, server, leaderboard):
+        await leaderboard.add(peer_id=10, user_id=1, delta=3)
+        await leaderboard.add(peer_id=20, user_id=1)
+        await leaderboard.add(peer_id=20, user_id=2, delta=2)
+        await server.database.buffer.flush()
+        leaderboard.boards = {}
+
+        await leaderboard.load()
+        assert leaderboard.board(20).top() == [Score(1, 2, 2), Score(2, 1, 1)]
+        assert leaderboard.board(30).top() == []
+
+    async def test_page_sees_other_processes(self, leaderboard):
+        await leaderboard.add(peer_id=10, user_id=1, delta=3)
+        # written by the process that handles chat 20
+        await ScoreModel.create(peer_id=20, user_id=2, score=5)
+        await ScoreModel.create(peer_id=20, user_id=1, score=1)
+
+        assert await leaderboard.page() == (2, [Score(1, 2, 5), Score(2, 1, 4)])
+        assert await leaderboard.page(20, offset=1) == (2, [Score(2, 1, 1)])
+        assert await leaderboard.page(30) == (0, [])
+
+
+class TestLeaderboardView:
+    async def test_unauthorized(self, cli):
+        resp = await cli.get("/leaderboard.list")
+        assert resp.status == 401
+
+    async def test_pages(self, authed_cli, leaderboard):
+        for user_id in range(1, 6):
+            await leaderboard.add(peer_id=10, user_id=user_id, delta=user_id)
+        await leaderboard.add(peer_id=20, user_id=1, delta=10)
+
+        resp = await authed_cli.get(
+            "/leaderboard.list", params={"peer_id": 10, "offset": 1, "limit": 2}
+        )
+        assert resp.status == 200
+        assert await resp.json() == ok_response(
+            data={
+                "peer_id": 10,
+                "total": 5,
+                "scores": [
+                    {"place": 2, "user_id": 4, "score": 4},
+                    {"place": 3, "user_id": 3, "score": 3},
+                ],
+            }
+        )
+
+        resp = await authed_cli.get("/leaderboard.list")
+        data = (await resp.json())["data"]
+        assert data["peer_id"] is None and data["total"] == 5
+        assert data["scores"][0] == {"place": 1, "user_id": 1, "score": 11}
+
+    async def test_limit_is_bounded(self, authed_cli):
+        resp = await authed_cli.get("/leaderboard.list", params={"limit": 1000})
+        assert resp.status == 400
+
+
+class TestTopCommand:
+    async def test_top(self, store, leaderboard):
+        await leaderboard.add(peer_id=10, user_id=7, delta=2)
+        await store.bots_manager.handle_update(
+            Update(
+                type="message_new",
+                object=UpdateObject(id=1, user_id=7, body=TOP, peer_id=10),
+            )
+        )
+        message = store.vk_api.send_message.mock_calls[-1].args[0]
+        assert "1. id7: 2" in message.text
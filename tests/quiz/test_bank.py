@@ -0,0 +1,102 @@
+import asyncio
+
+from app.quiz.models import Answer, Question
+from app.store import Store
+from app.store.database.gino import db
+from app.store.quiz.accessor import CREATE_QUESTION
+from app.store.quiz.bank import QuestionBank
+
+
+def make_question(id_: int, theme_id: int) -> Question:
+    return Question(
+        id=id_,
+        title=f"question {id_}",
+        theme_id=theme_id,
+        answers=[
+            Answer(title="No", is_correct=False),
+            Answer(title="  Mount  Everest", is_correct=True),
+        ],
+    )
+
+
+class TestQuestionBank:
+    def test_indexes(self):
+        bank = QuestionBank()
+        bank.load([make_question(1, 1), make_question(2, 2)], version=3)
+        bank.add(make_question(3, 1))
+
+        assert bank.version == 3 and len(bank) == 3
+        assert bank.question_ids(theme_id=1) == [1, 3]
+        assert bank.question_ids(theme_id=5) == []
+        assert bank.matchers[1].is_correct("mount everest")
+
+    def test_ids_are_sorted(self):
+        bank = QuestionBank()
+        bank.load([make_question(3, 1), make_question(1, 2), make_question(2, 1)], 1)
+        bank.add(make_question(4, 2))
+
+        assert bank.question_ids() == [1, 2, 3, 4]
+        assert bank.question_ids(theme_id=1) == [2, 3]
+        assert bank.question_ids(theme_id=2) == [1, 4]
+
+
+class TestQuestionBankAccessor:
+    async def test_refresh_loads_questions(self, store: Store, question_1):
+        store.quizzes.bank.version = None
+        await store.quizzes.refresh_bank()
+
+        assert list(store.quizzes.bank.questions) == [question_1.id]
+        assert store.quizzes.bank.version == await store.quizzes.get_version()
+
+    async def test_admin_write_updates_bank_in_place(
+        self, store: Store, question_1, theme_1, answers
+    ):
+        await store.quizzes.refresh_bank()
+        version = store.quizzes.bank.version
+
+        question = await store.quizzes.create_question("new", theme_1.id, answers)
+
+        bank = store.quizzes.bank
+        assert bank.version == version + 1 == await store.quizzes.get_version()
+        assert bank.questions[question.id] == question
+        assert bank.question_ids(theme_1.id) == [question_1.id, question.id]
+
+    async def test_write_of_another_process_is_picked_up(
+        self, store: Store, question_1, theme_1, answers
+    ):
+        await store.quizzes.refresh_bank()
+        await store.quizzes.bump_version()
+        await store.quizzes.refresh_bank()
+
+        assert store.quizzes.bank.version == await store.quizzes.get_version()
+        assert list(store.quizzes.bank.questions) == [question_1.id]
+
+    async def test_start_reloads_in_the_background(
+        self, store: Store, question_1, theme_1, answers, monkeypatch
+    ):
+        # another process adds a question
+        await db.first(
+            CREATE_QUESTION,
+            title="other",
+            theme_id=theme_1.id,
+            titles=["other yes", "other no"],
+            correct=[True, False],
+        )
+        games = store.bots_manager.games
+        list_questions = store.quizzes.list_questions
+        reload = asyncio.Event()
+
+        async def slow_list_questions(*args, **kwargs):
+            await reload.wait()
+            return await list_questions(*args, **kwargs)
+
+        monkeypatch.setattr(store.quizzes, "list_questions", slow_list_questions)
+        try:
+            await games.start(1)
+            assert list(store.quizzes.bank.questions) == [question_1.id]
+        finally:
+            reload.set()
+            await games.stop(1)
+
+        await store.quizzes.refresh_task
+        assert len(store.quizzes.bank) == 2
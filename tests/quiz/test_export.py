@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from app.quiz.models import QuestionModel, ThemeModel
+from app.store import Store
+from app.store.quiz.exporter import write_archive
+from tests.quiz import question2dict, theme2dict
+
+
+def read_archive(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+
+class TestQuizExportView:
+    async def test_unauthorized(self, cli):
+        resp = await cli.get("/quiz.export")
+        assert resp.status == 401
+
+    async def test_export(self, authed_cli, theme_1, theme_2, question_1, question_2):
+        resp = await authed_cli.get("/quiz.export")
+        assert resp.status == 200
+        assert resp.content_type == "application/gzip"
+
+        rows = read_archive(await resp.read())
+        assert rows == [
+            {"type": "theme", **theme2dict(theme_1)},
+            {"type": "theme", **theme2dict(theme_2)},
+            {"type": "question", **question2dict(question_1)},
+            {"type": "question", **question2dict(question_2)},
+        ]
+
+    async def test_export_is_imported_elsewhere(
+        self, authed_cli, store: Store, theme_1, question_1
+    ):
+        archive = await (await authed_cli.get("/quiz.export")).read()
+        # another environment: the theme gets a new id
+        await QuestionModel.delete.gino.status()
+        await ThemeModel.delete.gino.status()
+        other = await store.quizzes.create_theme("other")
+
+        resp = await authed_cli.post(
+            "/quiz.import_questions",
+            data=archive,
+            headers={
+                "Content-Type": "application/x-ndjson",
+                "Content-Encoding": "gzip",
+            },
+        )
+        data = (await resp.json())["data"]
+        assert data["themes"] == 1 and data["imported"] == 1 and data["failed"] == 0
+
+        [theme] = await store.quizzes.find_themes(set(), {theme_1.title})
+        assert theme.id != theme_1.id and theme.id > other.id
+        [question] = await store.quizzes.list_questions(theme_id=theme.id)
+        assert question.title == question_1.title
+        assert question.answers == question_1.answers
+
+
+class TestWriteArchive:
+    async def test_archive_file(self, store: Store, tmp_path, theme_1, question_1):
+        path = tmp_path / "quiz.ndjson.gz"
+        await write_archive(store.quizzes, str(path))
+
+        rows = read_archive(path.read_bytes())
+        assert [row["type"] for row in rows] == ["theme", "question"]
@@ -0,0 +1,121 @@
+import json
+
+from app.store import Store
+from app.store.quiz.importer import QuestionImporter, ndjson_rows
+from tests.utils import ok_response
+
+
+def question_line(title: str, answers: tuple = ("yes", "no"), **theme) -> str:
+    return json.dumps(
+        {
+            "title": title,
+            "answers": [
+                {"title": answer, "is_correct": number == 0}
+                for number, answer in enumerate(answers)
+            ],
+            **theme,
+        }
+    )
+
+
+async def lines_of(text: str):
+    for line in text.encode().splitlines(keepends=True):
+        yield line
+
+
+class TestQuestionImporter:
+    async def test_duplicates_across_chunks(self, store: Store, theme_1):
+        upload = "\n".join(
+            [
+                question_line("first", ("a", "b"), theme_id=theme_1.id),
+                question_line("second", ("c", "d"), theme_id=theme_1.id),
+                question_line("first", ("e", "f"), theme_id=theme_1.id),
+                question_line("third", ("a", "g"), theme_id=theme_1.id),
+            ]
+        )
+        importer = QuestionImporter(store.quizzes, chunk_size=2)
+        report = await importer.run(ndjson_rows(lines_of(upload)))
+
+        assert report.imported == 2 and report.failed == 2
+        assert [error.row for error in report.errors] == [3, 4]
+        titles = [q.title for q in await store.quizzes.list_questions()]
+        assert titles == ["first", "second"]
+
+    async def test_errors_are_capped(self, store: Store, theme_1):
+        upload = "\n".join(["not json"] * 5)
+        importer = QuestionImporter(store.quizzes, max_errors=2)
+        report = await importer.run(ndjson_rows(lines_of(upload)))
+
+        assert report.failed == 5 and len(report.errors) == 2
+
+    async def test_bank_is_reloaded(self, store: Store, theme_1):
+        await store.quizzes.refresh_bank()
+        upload = question_line("new", theme_id=theme_1.id)
+        await QuestionImporter(store.quizzes).run(ndjson_rows(lines_of(upload)))
+
+        await store.quizzes.refresh_bank()
+        assert [q.title for q in store.quizzes.bank.questions.values()] == ["new"]
+
+
+class TestQuestionImportView:
+    async def test_unauthorized(self, cli):
+        resp = await cli.post("/quiz.import_questions", data="")
+        assert resp.status == 401
+
+    async def test_ndjson(self, authed_cli, store: Store, theme_1, question_1):
+        upload = "\n".join(
+            [
+                question_line("by id", ("1", "2"), theme_id=theme_1.id),
+                question_line("by title", ("3", "4"), theme=theme_1.title),
+                "{broken",
+                question_line("no theme", ("5", "6"), theme="unknown"),
+                question_line(question_1.title, ("7", "8"), theme_id=theme_1.id),
+                question_line("taken answer", ("well", "9"), theme_id=theme_1.id),
+                question_line("one answer", ("10",), theme_id=theme_1.id),
+            ]
+        )
+        resp = await authed_cli.post(
+            "/quiz.import_questions",
+            data=upload.encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data["data"]["imported"] == 2 and data["data"]["failed"] == 5
+        errors = {error["row"]: error["errors"] for error in data["data"]["errors"]}
+        assert errors[3] == {"_schema": ["Invalid JSON."]}
+        assert errors[4] == {"theme": ["Theme not found."]}
+        assert errors[5] == {"title": ["Question already exists."]}
+        assert errors[6] == {"answers": ["Answer already exists."]}
+        assert "answers" in errors[7]
+
+        questions = await store.quizzes.list_questions(theme_id=theme_1.id)
+        assert [q.title for q in questions] == [question_1.title, "by id", "by title"]
+        assert questions[2].answers[0].is_correct
+
+    async def test_csv(self, authed_cli, store: Store, theme_1):
+        upload = (
+            "title,theme_id,correct,answer1,answer2,answer3\n"
+            f"capital of France,{theme_1.id},2,Berlin,Paris,Rome\n"
+            f"bad,{theme_1.id},x,a,b,\n"
+        )
+        resp = await authed_cli.post(
+            "/quiz.import_questions",
+            data=upload.encode(),
+            headers={"Content-Type": "text/csv"},
+        )
+        assert resp.status == 200
+        assert await resp.json() == ok_response(
+            data={
+                "themes": 0,
+                "imported": 1,
+                "failed": 1,
+                "errors": [{"row": 3, "errors": {"correct": ["Not a valid integer."]}}],
+            }
+        )
+        [question] = await store.quizzes.list_questions()
+        assert [(a.title, a.is_correct) for a in question.answers] == [
+            ("Berlin", False),
+            ("Paris", True),
+            ("Rome", False),
+        ]
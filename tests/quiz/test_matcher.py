@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from app.quiz.models import Answer
+from app.store.quiz.matcher import AnswerMatcher, normalize
+
+ANSWERS = [
+    Answer(title="Пётр I", is_correct=False),
+    Answer(title="Екатерина II", is_correct=True),
+    Answer(title="Елизавета Петровна", is_correct=False),
+    Answer(title="Павел I", is_correct=False),
+]
+
+
+class TestNormalize:
+    def test_normalize(self):
+        assert normalize("  Ёлка,  ЁЖИК!\n«да» ") == "елка ежик да"
+
+
+class TestAnswerMatcher:
+    def test_exact_and_number(self):
+        matcher = AnswerMatcher(ANSWERS)
+        assert matcher.match("екатерина ii") == 1
+        assert matcher.match("Пётр I.") == 0
+        assert matcher.match("2") == 1 and matcher.match(" 4) ") == 3
+        assert matcher.match("5") is None
+
+    def test_unique_prefix(self):
+        matcher = AnswerMatcher(ANSWERS)
+        assert matcher.match("екат") == 1
+        assert matcher.match("пав") == 3
+        # "ел" is too short and "е" is shared, neither identifies an answer
+        assert matcher.match("ел") is None
+        assert matcher.match("е") is None
+
+    def test_shared_prefix_is_ambiguous(self):
+        matcher = AnswerMatcher(
+            [Answer("Москва", True), Answer("Мосул", False)], max_distance=0
+        )
+        assert matcher.match("мос") is None
+        assert matcher.match("моск") == 0
+
+    def test_typos(self):
+        matcher = AnswerMatcher(ANSWERS, max_distance=1)
+        assert matcher.is_correct("Екатерна II")
+        assert not matcher.is_correct("Екатрна II")
+        assert AnswerMatcher(ANSWERS).match("Екатерна II") is None
+        # short titles are never matched fuzzily
+        short = AnswerMatcher([Answer("Да", True), Answer("Нет", False)], 1)
+        assert short.match("до") is None
+
+    @pytest.mark.benchmark
+    def test_10k_replies_per_second(self):
+        matcher = AnswerMatcher(ANSWERS, max_distance=1)
+        replies = ["2", "Екатерина II", "екат", "Павел I!", "не знаю"] * 2000
+
+        started = time.perf_counter()
+        for reply in replies:
+            matcher.match(reply)
+        elapsed = time.perf_counter() - started
+
+        # usually ~20ms, the bound only guards against an accidental O(n^2)
+        assert elapsed < 1, f"{len(replies) / elapsed:.0f} replies/s"
@@ -1,3 +1,5 @@
+import asyncio
+import json
 from typing import List
 
 from asyncpg import (
@@ -57,6 +59,41 @@ class TestQuestionsStore:
                 question_1.title, question_1.theme_id, answers
             )
 
+    async def test_create_question_is_atomic(
+        self, store: Store, question_1: Question, theme_1: Theme
+    ):
+        # the question row is inserted, then the taken answer title fails
+        taken = [Answer(title="well", is_correct=True), Answer("new", False)]
+        with pytest.raises(UniqueViolationError):
+            await store.quizzes.create_question("new", theme_1.id, taken)
+
+        assert await store.quizzes.get_question_by_title("new") is None
+        assert len(await AnswerModel.query.gino.all()) == 2
+
+    async def test_create_question_bumps_version(
+        self, store: Store, theme_1: Theme, answers: List[Answer]
+    ):
+        version = await store.quizzes.get_version()
+        await store.quizzes.create_question("title", theme_1.id, answers)
+        assert await store.quizzes.get_version() == version + 1
+
+    async def test_concurrent_duplicates(self, store: Store, theme_1: Theme):
+        results = await asyncio.gather(
+            *(
+                store.quizzes.create_question(
+                    "title",
+                    theme_1.id,
+                    [Answer(f"yes {i}", True), Answer(f"no {i}", False)],
+                )
+                for i in range(2)
+            ),
+            return_exceptions=True,
+        )
+        assert sorted(type(r).__name__ for r in results) == [
+            "Question",
+            "UniqueViolationError",
+        ]
+
     async def test_get_question_by_title(self, cli, store: Store, question_1: Question):
         assert question_1 == await store.quizzes.get_question_by_title(question_1.title)
 
@@ -66,6 +103,45 @@ class TestQuestionsStore:
         questions = await store.quizzes.list_questions()
         assert questions == [question_1, question_2]
 
+    async def test_list_questions_of_theme(
+        self, store: Store, theme_2: Theme, question_1: Question, answers
+    ):
+        question = await store.quizzes.create_question("other", theme_2.id, answers)
+
+        assert await store.quizzes.list_questions(theme_2.id) == [question]
+        assert await store.quizzes.list_questions(question_1.theme_id) == [question_1]
+        assert await store.quizzes.list_questions(theme_id=100500) == []
+
+    async def test_list_questions_page(
+        self, store: Store, question_1: Question, question_2: Question
+    ):
+        # the limit counts questions, not joined answer rows
+        assert await store.quizzes.list_questions(limit=1) == [question_1]
+        assert await store.quizzes.list_questions(
+            after_id=question_1.id, limit=1
+        ) == [question_2]
+        assert await store.quizzes.list_questions(after_id=question_2.id) == []
+
+    async def test_iter_questions(
+        self, store: Store, question_1: Question, question_2: Question
+    ):
+        questions = [q async for q in store.quizzes.iter_questions()]
+        assert questions == [question_1, question_2]
+
+        after = store.quizzes.iter_questions(after_id=question_1.id)
+        assert [q async for q in after] == [question_2]
+
+    async def test_foreign_keys_are_indexed(self, cli, store: Store):
+        db = cli.app.database.db
+        indexes = await db.all(
+            db.text(
+                "SELECT indexname FROM pg_indexes "
+                "WHERE tablename IN ('questions', 'answers')"
+            )
+        )
+        names = {row[0] for row in indexes}
+        assert {"questions_theme_id_idx", "answers_question_id_idx"} <= names
+
     async def test_check_cascade_delete(self, store: Store, question_1: Question):
         await QuestionModel.delete.where(
             QuestionModel.id == question_1.id
@@ -132,6 +208,22 @@ class TestQuestionAddView:
         data = await resp.json()
         assert data["status"] == "unauthorized"
 
+    async def test_conflict(self, authed_cli, question_1):
+        resp = await authed_cli.post(
+            "/quiz.add_question",
+            json={
+                "title": question_1.title,
+                "theme_id": question_1.theme_id,
+                "answers": [
+                    {"title": "one", "is_correct": False},
+                    {"title": "two", "is_correct": True},
+                ],
+            },
+        )
+        assert resp.status == 409
+        data = await resp.json()
+        assert data["status"] == "conflict"
+
     async def test_theme_not_found(self, authed_cli):
         resp = await authed_cli.post(
             "/quiz.add_question",
@@ -237,3 +329,52 @@ class TestQuestionListView:
         assert data == ok_response(
             data={"questions": [question2dict(question_1), question2dict(question_2)]}
         )
+
+    async def test_filter_by_theme(self, authed_cli, theme_2, question_1, answers):
+        resp = await authed_cli.get(
+            "/quiz.list_questions", params={"theme_id": theme_2.id}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data == ok_response(data={"questions": []})
+
+    async def test_pagination(self, authed_cli, question_1, question_2):
+        resp = await authed_cli.get(
+            "/quiz.list_questions", params={"after_id": question_1.id, "limit": 1}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data == ok_response(data={"questions": [question2dict(question_2)]})
+
+    async def test_no_limit_lists_every_question(self, authed_cli, store, theme_1):
+        questions = [
+            Question(
+                id=None,
+                title=f"question {i}",
+                theme_id=theme_1.id,
+                answers=[Answer(title=f"answer {i}", is_correct=True)],
+            )
+            for i in range(1001)
+        ]
+        await store.quizzes.copy_questions(questions)
+
+        resp = await authed_cli.get("/quiz.list_questions")
+        assert resp.status == 200
+        data = await resp.json()
+        assert len(data["data"]["questions"]) == 1001
+
+    async def test_limit_is_bounded(self, authed_cli):
+        resp = await authed_cli.get("/quiz.list_questions", params={"limit": 0})
+        assert resp.status == 400
+
+    async def test_stream(self, authed_cli, question_1, question_2):
+        resp = await authed_cli.get(
+            "/quiz.list_questions", params={"stream": "true"}
+        )
+        assert resp.status == 200
+        assert resp.content_type == "application/x-ndjson"
+        lines = (await resp.text()).splitlines()
+        assert [json.loads(line) for line in lines] == [
+            question2dict(question_1),
+            question2dict(question_2),
+        ]
@@ -0,0 +1,65 @@
+import random
+import time
+
+import pytest
+
+from app.store.quiz.bank import QuestionBank
+from app.store.quiz.selector import Deck, QuestionSelector
+
+
+def make_selector(size: int) -> QuestionSelector:
+    bank = QuestionBank()
+    # the selector only needs the ids, building a million questions is slow
+    bank.ids = list(range(1, size + 1))
+    bank.by_theme = {1: bank.ids[::2], 2: bank.ids[1::2]}
+    return QuestionSelector(bank)
+
+
+def pick_time(selector: QuestionSelector, picks: int = 100000) -> float:
+    deck = selector.deck()
+    started = time.perf_counter()
+    for position in range(picks):
+        selector.pick(deck, position)
+    return time.perf_counter() - started
+
+
+class TestQuestionSelector:
+    def test_deck_is_a_permutation(self):
+        rng = random.Random(1)
+        for size in (1, 2, 7, 12, 64, 97, 360):
+            selector = make_selector(size)
+            for _ in range(20):
+                deck = selector.deck(rng=rng)
+                picks = [selector.pick(deck, i) for i in range(size)]
+                assert sorted(picks) == selector.bank.ids
+
+    def test_theme_deck(self):
+        selector = make_selector(10)
+        deck = selector.deck(theme_id=2)
+
+        assert deck.size == 5
+        picks = {selector.pick(deck, i, theme_id=2) for i in range(5)}
+        assert picks == {2, 4, 6, 8, 10}
+        assert selector.deck(theme_id=3) is None
+
+    def test_deck_survives_new_questions(self):
+        selector = make_selector(10)
+        deck = selector.deck()
+        before = [selector.pick(deck, i) for i in range(10)]
+        selector.bank.ids.extend(range(11, 21))
+
+        assert [selector.pick(deck, i) for i in range(10)] == before
+
+    def test_pick_out_of_bank(self):
+        selector = make_selector(3)
+        assert selector.pick(Deck(size=5, step=1, offset=3), 0) is None
+
+    @pytest.mark.benchmark
+    def test_constant_time_at_1m_questions(self):
+        small = pick_time(make_selector(1000))
+        large = pick_time(make_selector(1000000))
+
+        # no sort and no scan: a pick costs the same at 1k and at 1M
+        # questions, up to cache misses of the larger list
+        assert large < small * 5, f"1k: {small:.3f}s, 1M: {large:.3f}s"
+        assert make_selector(1000000).deck().size == 1000000
@@ -1,4 +1,5 @@
 from app.quiz.models import Theme, ThemeModel
+from app.store.quiz.accessor import THEMES_VERSION
 from tests.quiz import theme2dict
 from tests.utils import ok_response
 from app.store import Store
@@ -35,6 +36,30 @@ class TestThemeStore:
         theme = await store.quizzes.get_theme_by_title(theme_1.title)
         assert theme is not None
 
+    async def test_list_themes_page(self, store: Store, theme_1: Theme, theme_2: Theme):
+        assert await store.quizzes.list_themes(limit=1) == [theme_1]
+        assert await store.quizzes.list_themes(after_id=theme_1.id) == [theme_2]
+        assert await store.quizzes.list_themes(after_id=theme_2.id, limit=5) == []
+
+    async def test_list_themes_is_cached(self, store: Store, theme_1: Theme):
+        assert await store.quizzes.list_themes() == [theme_1]
+        # a write that doesn't bump the themes version is not seen
+        await ThemeModel.create(title="hidden")
+        assert await store.quizzes.list_themes() == [theme_1]
+
+        theme = await store.quizzes.create_theme("visible")
+        themes = await store.quizzes.list_themes()
+        assert [t.title for t in themes] == [theme_1.title, "hidden", theme.title]
+
+    async def test_theme_of_another_process_is_seen(self, store: Store, theme_1):
+        assert await store.quizzes.list_themes() == [theme_1]
+        # another process creates a theme, this one's cache is outdated
+        await ThemeModel.create(title="other")
+        await store.quizzes.bump_version(THEMES_VERSION)
+
+        themes = await store.quizzes.list_themes()
+        assert [t.title for t in themes] == [theme_1.title, "other"]
+
     async def test_check_cascade_delete(self, store: Store, theme_1: Theme):
         pass
 
@@ -126,6 +151,51 @@ class TestThemeList:
             data={"themes": [theme2dict(theme_1), theme2dict(theme_2)]}
         )
 
+    async def test_pagination(self, authed_cli, theme_1, theme_2):
+        resp = await authed_cli.get(
+            "/quiz.list_themes", params={"after_id": theme_1.id, "limit": 1}
+        )
+        assert resp.status == 200
+        data = await resp.json()
+        assert data == ok_response(data={"themes": [theme2dict(theme_2)]})
+
+    async def test_no_limit_lists_every_theme(self, authed_cli, store):
+        await store.quizzes.create_themes({f"theme {i}" for i in range(1001)})
+
+        resp = await authed_cli.get("/quiz.list_themes")
+        assert resp.status == 200
+        data = await resp.json()
+        assert len(data["data"]["themes"]) == 1001
+
+    async def test_not_modified(self, authed_cli, store, theme_1):
+        resp = await authed_cli.get("/quiz.list_themes")
+        etag = resp.headers["ETag"]
+
+        resp = await authed_cli.get(
+            "/quiz.list_themes", headers={"If-None-Match": etag}
+        )
+        assert resp.status == 304
+        assert resp.headers["ETag"] == etag
+
+        await store.quizzes.create_theme("new")
+        resp = await authed_cli.get(
+            "/quiz.list_themes", headers={"If-None-Match": etag}
+        )
+        assert resp.status == 200
+        assert resp.headers["ETag"] != etag
+
+    async def test_modified_by_another_process(self, authed_cli, store, theme_1):
+        resp = await authed_cli.get("/quiz.list_themes")
+        etag = resp.headers["ETag"]
+
+        await ThemeModel.create(title="other")
+        await store.quizzes.bump_version(THEMES_VERSION)
+        resp = await authed_cli.get(
+            "/quiz.list_themes", headers={"If-None-Match": etag}
+        )
+        assert resp.status == 200
+        assert len((await resp.json())["data"]["themes"]) == 2
+
     async def test_different_method(self, authed_cli):
         resp = await authed_cli.post("/quiz.list_themes")
         assert resp.status == 405
@@ -0,0 +1,78 @@
+import asyncio
+import random
+from unittest.mock import AsyncMock, Mock
+
+from app.store.timers.accessor import TimerAccessor
+from app.store.timers.wheel import TimerWheel
+from app.web.config import BotConfig
+
+
+def expire_times(wheel: TimerWheel, ticks: int) -> dict:
+    fired = {}
+    for _ in range(ticks):
+        for key in wheel.advance():
+            fired[key] = wheel.now
+    return fired
+
+
+class TestTimerWheel:
+    def test_timer_fires_on_its_tick(self):
+        wheel = TimerWheel(slots=4, levels=3)
+        wheel.schedule("a", 3)
+        assert wheel.advance(2) == []
+        assert wheel.advance() == ["a"]
+        assert len(wheel) == 0
+
+    def test_deadlines_of_every_level_are_exact(self):
+        wheel = TimerWheel(slots=4, levels=3)
+        rng = random.Random(1)
+        deadlines, fired = {}, {}
+        for key in range(500):
+            fired.update(expire_times(wheel, rng.randrange(3)))
+            ticks = rng.randrange(1, 200)
+            wheel.schedule(key, ticks)
+            deadlines[key] = wheel.now + ticks
+
+        # 200 ticks exceed the 64 the three levels cover, so the top level
+        # keeps far timers and puts them back until they are in range
+        fired.update(expire_times(wheel, 200))
+        assert fired == deadlines
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimerWheel(slots=4, levels=2)
+        wheel.schedule("a", 2)
+        wheel.schedule("b", 2)
+        assert wheel.cancel("a") is True
+        assert wheel.cancel("a") is False
+        wheel.schedule("b", 10)
+
+        assert expire_times(wheel, 20) == {"b": 10}
+
+    def test_memory_stays_flat(self):
+        wheel = TimerWheel()
+        for key in range(50000):
+            wheel.schedule(key, key % 5000 + 1)
+        assert len(wheel) == 50000
+        assert sum(len(b) for level in wheel.wheels for b in level) == 50000
+
+        expire_times(wheel, 5000)
+        assert len(wheel) == 0
+
+
+class TestTimerAccessor:
+    async def test_expired_timers_are_handled_in_batches(self):
+        app = Mock()
+        app.config.bot = BotConfig(timer_tick=0.01)
+        app.store.bots_manager.handle_timeouts = AsyncMock()
+        timers = TimerAccessor(app)
+        await timers.connect(app)
+        timers.schedule(1, 0.02)
+        timers.schedule(2, 0.02)
+        timers.schedule(3, 0.02)
+        timers.cancel(3)
+        await asyncio.sleep(0.1)
+        await timers.disconnect(app)
+
+        handle_timeouts = app.store.bots_manager.handle_timeouts
+        assert handle_timeouts.call_count == 1
+        assert sorted(handle_timeouts.call_args.args[0]) == [1, 2]
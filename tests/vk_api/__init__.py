@@ -0,0 +1,10 @@
+from aioresponses import aioresponses
+
+
+def sent_requests(mocked: aioresponses, url: str) -> list:
+    return [
+        call
+        for (_, request_url), calls in mocked.requests.items()
+        if str(request_url).startswith(url)
+        for call in calls
+    ]
@@ -0,0 +1,70 @@
+import pytest
+
+from app.bot.models import LongPollCheckpointModel
+from app.store.vk_api.checkpoint import (
+    Checkpointer,
+    CheckpointStore,
+    DatabaseCheckpointStore,
+    FileCheckpointStore,
+)
+from tests.utils import check_empty_table_exists
+
+
+class TestCheckpointStore:
+    def test_missing_method(self):
+        class LoadOnly(CheckpointStore):
+            async def load(self, group_id):
+                return None
+
+        with pytest.raises(TypeError):
+            LoadOnly()
+
+
+class TestDatabaseCheckpointStore:
+    async def test_table_exists(self, cli):
+        await check_empty_table_exists(cli, "long_poll_checkpoints")
+
+    async def test_save_and_load(self, cli):
+        store = DatabaseCheckpointStore()
+        assert await store.load(1) is None
+
+        await store.save(1, 10)
+        await store.save(1, "11")
+        await store.save(2, 20)
+
+        assert await store.load(1) == 11
+        assert await store.load(2) == 20
+        assert len(await LongPollCheckpointModel.query.gino.all()) == 2
+
+
+class TestFileCheckpointStore:
+    async def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "checkpoint.json")
+        store = FileCheckpointStore(path)
+        assert await store.load(1) is None
+
+        await store.save(1, 10)
+        await store.save(2, 20)
+
+        assert await FileCheckpointStore(path).load(1) == 10
+        assert await FileCheckpointStore(path).load(2) == 20
+
+
+class TestCheckpointer:
+    async def test_only_changes_are_saved(self, tmp_path):
+        saved = []
+
+        class Store(FileCheckpointStore):
+            async def save(self, group_id, ts):
+                saved.append(ts)
+
+        checkpointer = Checkpointer(Store(""), group_id=1, interval=60)
+        await checkpointer.flush()
+        checkpointer.commit(5)
+        checkpointer.commit(6)
+        await checkpointer.flush()
+        await checkpointer.flush()
+        checkpointer.commit(7)
+        await checkpointer.stop()
+
+        assert saved == [6, 7]
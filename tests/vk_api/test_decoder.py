@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from app.store.vk_api import decoder
+from app.store.vk_api.decoder import get_decoder
+
+
+class TestDecoder:
+    def test_stdlib(self):
+        assert get_decoder("json") is json.loads
+
+    def test_auto_falls_back_to_stdlib(self, monkeypatch):
+        monkeypatch.setattr(decoder, "orjson", None)
+        assert get_decoder() is json.loads
+        with pytest.raises(ValueError):
+            get_decoder("orjson")
+
+    def test_decodes_bytes(self):
+        body = '{"ts": 1, "updates": [{"text": "привет"}]}'.encode()
+        for name in ("auto", "json"):
+            assert get_decoder(name)(body)["updates"][0]["text"] == "привет"
+
+    def test_unknown_decoder(self):
+        with pytest.raises(ValueError):
+            get_decoder("yaml")
@@ -0,0 +1,54 @@
+import asyncio
+
+from aiohttp import web
+
+from app.store.vk_api.http import PoolStats, make_session
+
+
+async def make_server(aiohttp_server, delay: float = 0):
+    async def handler(request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        return web.json_response({"response": 1})
+
+    server_app = web.Application()
+    server_app.router.add_get("/method", handler)
+    return await aiohttp_server(server_app)
+
+
+def make_stats_session(limit_per_host: int):
+    stats = PoolStats(limit_per_host=limit_per_host)
+    session = make_session(
+        stats, limit=limit_per_host, keepalive_timeout=30, dns_cache_ttl=300, timeout=5
+    )
+    return stats, session
+
+
+class TestPoolStats:
+    async def test_connections_are_reused(self, aiohttp_server):
+        server = await make_server(aiohttp_server)
+        stats, session = make_stats_session(limit_per_host=2)
+        for _ in range(5):
+            async with session.get(server.make_url("/method")) as resp:
+                await resp.json()
+        await session.close()
+
+        assert stats.requests == 5
+        assert stats.in_flight == 0
+        assert stats.connections_created == 1
+        assert stats.connections_reused == 4
+        assert stats.queued == 0
+
+    async def test_saturation_is_counted(self, aiohttp_server):
+        server = await make_server(aiohttp_server, delay=0.02)
+        stats, session = make_stats_session(limit_per_host=1)
+
+        async def request():
+            async with session.get(server.make_url("/method")) as resp:
+                await resp.json()
+
+        await asyncio.gather(*(request() for _ in range(3)))
+        await session.close()
+
+        assert stats.connections_created == 1
+        assert stats.queued == 2
+        assert stats.queued_time > 0
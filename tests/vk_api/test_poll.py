@@ -0,0 +1,254 @@
+import asyncio
+import re
+
+from aiohttp import ClientConnectionError, web
+from aioresponses import aioresponses
+
+from app.store.bot.pipeline import Pipeline
+from app.store.vk_api.group import API_PATH
+from app.store.vk_api.dataclasses import UpdateBatch
+from tests.vk_api import sent_requests
+
+BATCHES = 20
+BATCH_SIZE = 50
+LONG_POLL_SERVER = "https://lp.vk.com/wh1"
+LONG_POLL = re.compile(r"^https://lp\.vk\.com/wh1\?.*$")
+GET_SERVER = API_PATH + "groups.getLongPollServer"
+
+
+def make_raw_update(id_: int) -> dict:
+    return {
+        "type": "message_new",
+        "object": {
+            "message": {
+                "id": id_,
+                "from_id": id_ % 7,
+                "peer_id": id_ % 7,
+                "text": "kek",
+            },
+            "client_info": {"keyboard": True},
+        },
+        "group_id": 1,
+    }
+
+
+async def long_poll_handler(request: web.Request) -> web.Response:
+    """Stub of the VK long-poll server: one full batch per ts."""
+    ts = int(request.query["ts"])
+    request.app["requests"].append(ts)
+    if ts >= BATCHES:
+        await asyncio.sleep(0.05)
+        return web.json_response({"ts": ts, "updates": []})
+    return web.json_response(
+        {
+            "ts": ts + 1,
+            "updates": [
+                make_raw_update(ts * BATCH_SIZE + i) for i in range(BATCH_SIZE)
+            ],
+        }
+    )
+
+
+async def start_server(aiohttp_server, vk_group):
+    server_app = web.Application()
+    server_app["requests"] = []
+    server_app.router.add_get("/lp", long_poll_handler)
+    server = await aiohttp_server(server_app)
+    vk_group.server = str(server.make_url("/lp"))
+    vk_group.key = "key"
+    vk_group.ts = 0
+    return server_app["requests"]
+
+
+class TestPoll:
+    async def test_poll_returns_batch(self, aiohttp_server, vk_group):
+        await start_server(aiohttp_server, vk_group)
+        batch = await vk_group.poll()
+
+        assert type(batch) is UpdateBatch
+        assert batch.ts == 1 and vk_group.ts == 1
+        assert len(batch.updates) == BATCH_SIZE
+        assert vk_group.accessor.app.store.bots_manager.handle_update.called is False
+
+    async def test_message_new_fields(self, vk_group):
+        vk_group.server, vk_group.key, vk_group.ts = LONG_POLL_SERVER, "key", 1
+        raw = make_raw_update(8)
+        raw["object"]["message"]["payload"] = '{"command":"start"}'
+        raw["object"]["message"]["conversation_message_id"] = 3
+        reply = {"type": "message_reply", "object": {"id": 9, "text": "hi"}}
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, payload={"ts": 2, "updates": [raw, reply]})
+            batch = await vk_group.poll()
+
+        [update] = batch.updates
+        assert update.group_id == 1
+        assert update.object.id == 8 and update.object.user_id == 1
+        assert update.object.peer_id == 1 and update.object.body == "kek"
+        assert update.object.payload == '{"command":"start"}'
+        assert update.object.conversation_message_id == 3
+        assert update.object.raw["client_info"] == {"keyboard": True}
+
+    async def test_each_update_is_dispatched_once(self, aiohttp_server, vk_group):
+        requests = await start_server(aiohttp_server, vk_group)
+        handled = []
+
+        async def handle_update(update):
+            handled.append(update.object.id)
+
+        pipeline = Pipeline(
+            vk_group.poll, handle_update, workers=4, queue_size=BATCH_SIZE
+        )
+
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        await pipeline.start()
+        while len(handled) < BATCHES * BATCH_SIZE and loop.time() - started < 5:
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+
+        # a batch costs one long-poll request and one handler call per
+        # update, where the accessor used to dispatch every update again
+        assert sorted(handled) == list(range(BATCHES * BATCH_SIZE))
+        assert [ts for ts in requests if ts < BATCHES] == list(range(BATCHES))
+
+
+    async def test_message_without_sender_is_skipped(self, vk_group):
+        vk_group.server, vk_group.key, vk_group.ts = LONG_POLL_SERVER, "key", 1
+        anonymous = make_raw_update(9)
+        del anonymous["object"]["message"]["from_id"]
+        with aioresponses() as mocked:
+            mocked.get(
+                LONG_POLL, payload={"ts": 2, "updates": [anonymous, make_raw_update(8)]}
+            )
+            batch = await vk_group.poll()
+
+        assert [update.object.id for update in batch.updates] == [8]
+        assert vk_group.ts == 2
+
+
+class TestLongPollRecovery:
+    @staticmethod
+    def connected(vk_group):
+        vk_group.server = LONG_POLL_SERVER
+        vk_group.key = "old-key"
+        vk_group.ts = 10
+
+    async def test_ts_outdated(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, payload={"failed": 1, "ts": 30})
+            batch = await vk_group.poll()
+
+        assert batch.updates == []
+        assert vk_group.ts == 30 and vk_group.key == "old-key"
+        assert sent_requests(mocked, GET_SERVER) == []
+        assert vk_group.long_poll_stats.ts_outdated == 1
+
+    async def test_key_expired(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, payload={"failed": 2})
+            mocked.post(
+                GET_SERVER,
+                payload={
+                    "response": {
+                        "key": "new-key",
+                        "server": LONG_POLL_SERVER,
+                        "ts": 50,
+                    }
+                },
+            )
+            await vk_group.poll()
+
+        assert vk_group.key == "new-key" and vk_group.ts == 10
+        assert len(sent_requests(mocked, GET_SERVER)) == 1
+        assert vk_group.long_poll_stats.key_expired == 1
+        assert vk_group.long_poll_stats.reconnects == 1
+
+    async def test_info_lost(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, payload={"failed": 3})
+            mocked.post(
+                GET_SERVER,
+                payload={
+                    "response": {
+                        "key": "new-key",
+                        "server": LONG_POLL_SERVER,
+                        "ts": 50,
+                    }
+                },
+            )
+            await vk_group.poll()
+
+        assert vk_group.key == "new-key" and vk_group.ts == 50
+        assert vk_group.long_poll_stats.info_lost == 1
+
+    async def test_not_connected_server_is_fetched_with_backoff(self, vk_group):
+        with aioresponses() as mocked:
+            mocked.post(GET_SERVER, exception=ClientConnectionError())
+            mocked.post(
+                GET_SERVER,
+                payload={"error": {"error_code": 5, "error_msg": "auth"}},
+            )
+            mocked.post(
+                GET_SERVER,
+                payload={
+                    "response": {"key": "key", "server": LONG_POLL_SERVER, "ts": 1}
+                },
+            )
+            mocked.get(LONG_POLL, payload={"ts": 2, "updates": []})
+            batch = await vk_group.poll()
+
+        assert batch.ts == 2
+        assert len(sent_requests(mocked, GET_SERVER)) == 3
+        assert vk_group.long_poll_stats.errors == 2
+
+    async def test_network_error_keeps_key(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, exception=ClientConnectionError())
+            mocked.get(LONG_POLL, payload={"ts": 11, "updates": []})
+            assert (await vk_group.poll()).ts == 10
+            assert (await vk_group.poll()).ts == 11
+
+        assert sent_requests(mocked, GET_SERVER) == []
+        assert vk_group.long_poll_stats.errors == 1
+        assert vk_group.poll_errors == 0
+
+    async def test_body_that_is_not_json(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, status=502, body="<html>Bad Gateway</html>")
+            mocked.get(LONG_POLL, payload={"ts": 11, "updates": []})
+            assert (await vk_group.poll()).ts == 10
+            assert vk_group.poll_errors == 1
+            assert (await vk_group.poll()).ts == 11
+
+        assert vk_group.key == "old-key"
+        assert vk_group.long_poll_stats.errors == 1
+        assert vk_group.poll_errors == 0
+
+    async def test_unknown_failed_code(self, vk_group):
+        self.connected(vk_group)
+        with aioresponses() as mocked:
+            mocked.get(LONG_POLL, payload={"failed": 4}, repeat=True)
+            mocked.post(
+                GET_SERVER,
+                payload={
+                    "response": {
+                        "key": "new-key",
+                        "server": LONG_POLL_SERVER,
+                        "ts": 50,
+                    }
+                },
+                repeat=True,
+            )
+            await vk_group.poll()
+            await vk_group.poll()
+
+        # the errors add up, so the backoff keeps growing
+        assert vk_group.poll_errors == 2
+        assert vk_group.long_poll_stats.errors == 2
+        assert vk_group.key == "new-key" and vk_group.ts == 10
+        assert vk_group.long_poll_stats.reconnects == 2
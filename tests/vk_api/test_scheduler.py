@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from app.store.vk_api.dataclasses import Priority
+from app.store.vk_api.scheduler import RateLimiter
+
+
+class TestRateLimiter:
+    async def test_burst_is_not_delayed(self):
+        limiter = RateLimiter(rate=10, burst=5)
+        started = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        assert time.monotonic() - started < 0.05
+
+    async def test_rate_is_kept(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(11)))
+        assert time.monotonic() - started >= 0.09
+
+    async def test_priority_lanes(self):
+        limiter = RateLimiter(rate=200, burst=1)
+        await limiter.acquire()
+        order = []
+
+        async def acquire(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(
+            acquire("broadcast-1", Priority.BROADCAST),
+            acquire("broadcast-2", Priority.BROADCAST),
+            acquire("reply-1", Priority.REPLY),
+            acquire("reply-2", Priority.REPLY),
+        )
+        assert order == ["reply-1", "reply-2", "broadcast-1", "broadcast-2"]
+
+    async def test_adaptive_backoff(self):
+        limiter = RateLimiter(rate=20, burst=20, min_rate=1)
+        limiter.throttled()
+        assert limiter.rate == 10 and limiter.tokens <= 0
+        for _ in range(5):
+            limiter.throttled()
+        assert limiter.rate == 1
+        for _ in range(100):
+            limiter.succeeded()
+        assert limiter.rate == 20
@@ -0,0 +1,175 @@
+import asyncio
+from unittest.mock import Mock
+
+from aioresponses import aioresponses
+
+from app.store.vk_api.accessor import VkApiAccessor
+from app.store.vk_api.group import API_PATH
+from app.store.vk_api.coalescer import SendCoalescer
+from app.store.vk_api.dataclasses import Message, Priority
+from app.web.config import BotConfig
+from tests.vk_api import sent_requests
+
+
+class TestSendMessage:
+    async def test_single_message(self, vk_api):
+        with aioresponses() as mocked:
+            mocked.post(API_PATH + "messages.send", payload={"response": 1})
+            await vk_api.send_message(Message(user_id=1, text="hi"))
+
+        calls = sent_requests(mocked, API_PATH + "messages.send")
+        assert len(calls) == 1
+        assert calls[0].kwargs["data"]["message"] == "hi"
+        assert calls[0].kwargs["data"]["access_token"] == "token"
+
+    async def test_burst_is_sent_through_execute(self, vk_api):
+        with aioresponses() as mocked:
+            mocked.post(API_PATH + "execute", payload={"response": [1, 2, 3]})
+            await asyncio.gather(
+                *(
+                    vk_api.send_message(Message(user_id=i, text="привет"))
+                    for i in range(3)
+                )
+            )
+
+        assert sent_requests(mocked, API_PATH + "messages.send") == []
+        calls = sent_requests(mocked, API_PATH + "execute")
+        assert len(calls) == 1
+        code = calls[0].kwargs["data"]["code"]
+        assert code.count("API.messages.send(") == 3
+        assert "привет" in code
+
+    async def test_failed_call_does_not_fail_batch(self, vk_api, vk_group):
+        with aioresponses() as mocked:
+            mocked.post(
+                API_PATH + "execute",
+                payload={
+                    "response": [1, False],
+                    "execute_errors": [
+                        {"method": "messages.send", "error_code": 901}
+                    ],
+                },
+            )
+            results = await asyncio.gather(
+                vk_group.coalescers[Priority.REPLY].send({"user_id": 1}),
+                vk_group.coalescers[Priority.REPLY].send({"user_id": 2}),
+            )
+
+        assert results == [1, False]
+
+    async def test_too_many_requests_is_retried(self, vk_api, vk_group):
+        with aioresponses() as mocked:
+            mocked.post(
+                API_PATH + "messages.send",
+                payload={"error": {"error_code": 6, "error_msg": "Too many"}},
+            )
+            mocked.post(API_PATH + "messages.send", payload={"response": 1})
+            await vk_api.send_message(Message(user_id=1, text="hi"))
+
+        assert len(sent_requests(mocked, API_PATH + "messages.send")) == 2
+        assert vk_group.limiter.rate == 1000 / 2 + 1000 / 20
+
+    async def test_throttled_calls_in_execute_are_retried(self, vk_api, vk_group):
+        with aioresponses() as mocked:
+            mocked.post(
+                API_PATH + "execute",
+                payload={
+                    "response": [False, 2, False],
+                    "execute_errors": [
+                        {"method": "messages.send", "error_code": 6},
+                        {"method": "messages.send", "error_code": 901},
+                    ],
+                },
+            )
+            mocked.post(API_PATH + "messages.send", payload={"response": 1})
+            results = await vk_group._send_messages(
+                [{"user_id": 1}, {"user_id": 2}, {"user_id": 3}]
+            )
+
+        assert results == [1, 2, False]
+        assert len(sent_requests(mocked, API_PATH + "execute")) == 1
+        calls = sent_requests(mocked, API_PATH + "messages.send")
+        assert len(calls) == 1 and calls[0].kwargs["data"]["user_id"] == 1
+
+    async def test_other_errors_are_not_retried(self, vk_api):
+        with aioresponses() as mocked:
+            mocked.post(
+                API_PATH + "messages.send",
+                payload={"error": {"error_code": 901, "error_msg": "Forbidden"}},
+            )
+            await vk_api.send_message(Message(user_id=1, text="hi"))
+
+        assert len(sent_requests(mocked, API_PATH + "messages.send")) == 1
+
+
+class TestSendCoalescer:
+    async def test_results_are_routed_to_callers(self):
+        batches = []
+
+        async def flush(calls):
+            batches.append(calls)
+            return [call["n"] * 10 for call in calls]
+
+        coalescer = SendCoalescer(flush, max_batch=3, max_delay=0.01)
+        results = await asyncio.gather(*(coalescer.send({"n": n}) for n in range(7)))
+
+        assert results == [n * 10 for n in range(7)]
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+
+    async def test_error_is_raised_to_every_caller(self):
+        async def flush(calls):
+            raise RuntimeError
+
+        coalescer = SendCoalescer(flush, max_batch=2)
+        results = await asyncio.gather(
+            coalescer.send({}), coalescer.send({}), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_close_flushes_pending(self):
+        flushed = []
+
+        async def flush(calls):
+            flushed.extend(calls)
+            return calls
+
+        coalescer = SendCoalescer(flush, max_delay=60)
+        task = asyncio.create_task(coalescer.send({"n": 1}))
+        await asyncio.sleep(0)
+        await coalescer.close()
+
+        assert await task == {"n": 1}
+        assert flushed == [{"n": 1}]
+
+
+class TestGroups:
+    async def test_messages_are_sent_with_group_token(self):
+        app = Mock()
+        app.config.bot = BotConfig(
+            groups=[
+                {"token": "first-token", "group_id": 1},
+                {"token": "second-token", "group_id": 2},
+            ],
+        )
+        vk_api = VkApiAccessor(app)
+        vk_api.open()
+        with aioresponses() as mocked:
+            mocked.post(API_PATH + "messages.send", payload={"response": 1})
+            mocked.post(API_PATH + "messages.send", payload={"response": 2})
+            await vk_api.send_message(Message(user_id=1, text="hi", group_id=2))
+            await vk_api.send_message(Message(user_id=1, text="hi"))
+        await vk_api.session.close()
+        await vk_api.poll_session.close()
+
+        calls = sent_requests(mocked, API_PATH + "messages.send")
+        assert [c.kwargs["data"]["access_token"] for c in calls] == [
+            "second-token",
+            "first-token",
+        ]
+        poll_limit = app.config.bot.poll_limit_per_host
+        assert vk_api.poll_stats.limit_per_host == 2 * poll_limit
+
+    def test_single_group_config(self):
+        config = BotConfig(token="token", group_id=1)
+        assert [(g.token, g.group_id) for g in config.groups] == [("token", 1)]